@@ -8,9 +8,76 @@ import numpy as np
 import sys
 import os
 
+try:
+    from numba import njit, prange
+except ImportError:  # Sans numba, le kernel de score s'exécute en Python pur
+    prange = range
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
 # Ajouter le répertoire parent au path pour importer config
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# Colonnes lues dans le CSV et types explicites (pas d'inférence, types compacts)
+FEATURE_DTYPES = {
+    'dur': 'float32', 'proto': 'category', 'service': 'category', 'state': 'category',
+    'spkts': 'int32', 'dpkts': 'int32', 'sbytes': 'int64', 'dbytes': 'int64',
+    'sttl': 'int16', 'dttl': 'int16', 'swin': 'int32', 'dwin': 'int32',
+    'tcprtt': 'float32', 'synack': 'float32', 'ackdat': 'float32',
+}
+
+# Seuils des règles de suspicion (figés à la compilation du kernel numba)
+SHORT_DURATION = 0.1
+FEW_PACKETS = 5
+SMALL_SRC_WINDOW = 50
+SMALL_DST_WINDOW = 300
+
+# Règles dans l'ordre des bits de _suspicion_kernel : (raison, poids)
+SUSPICION_RULES = (
+    ("Connexion interrompue", 2),
+    ("TTL différents", 1),
+    ("Connexion très courte avec peu de paquets", 2),
+    ("Fenêtre TCP source très petite", 1),
+    ("Temps de réponse TCP anormaux", 1),
+)
+SUSPICION_WEIGHTS = np.array([weight for _, weight in SUSPICION_RULES], dtype=np.int8)
+SUSPICION_BITS = np.arange(len(SUSPICION_RULES), dtype=np.uint8)
+MAX_SUSPICION_SCORE = int(SUSPICION_WEIGHTS.sum())
+
+@njit(cache=True, parallel=True)
+def _suspicion_kernel(state_int, sttl, dttl, dur, spkts, dpkts, swin, tcprtt, synack):
+    """Bits des règles déclenchées pour tous les flux, en une passe"""
+    n = dur.shape[0]
+    flags = np.empty(n, np.uint8)
+    for i in prange(n):
+        f = 0
+        if state_int[i]:
+            f |= 1
+        if sttl[i] != dttl[i]:
+            f |= 2
+        if dur[i] < SHORT_DURATION and spkts[i] + dpkts[i] < FEW_PACKETS:
+            f |= 4
+        if swin[i] < SMALL_SRC_WINDOW:
+            f |= 8
+        if tcprtt[i] == 0.0 and synack[i] == 0.0:
+            f |= 16
+        flags[i] = f
+    return flags
+
+def score_flows(df):
+    """Retourne (scores, bits des règles déclenchées) de tous les flux"""
+    flags = _suspicion_kernel(
+        (df['state'] == 'INT').to_numpy(),
+        df['sttl'].to_numpy(), df['dttl'].to_numpy(), df['dur'].to_numpy(),
+        df['spkts'].to_numpy(), df['dpkts'].to_numpy(), df['swin'].to_numpy(),
+        df['tcprtt'].to_numpy(), df['synack'].to_numpy(),
+    )
+    # Scores = somme des poids de SUSPICION_RULES des bits levés
+    triggered = (flags[:, None] >> SUSPICION_BITS) & 1
+    return triggered @ SUSPICION_WEIGHTS, flags
+
 def analyze_suspicious_flow():
     """Analyser le flux détecté comme suspect"""
     
@@ -22,7 +89,7 @@ def analyze_suspicious_flow():
         return
     
     # Lire les données
-    df = pd.read_csv(features_file)
+    df = pd.read_csv(features_file, usecols=list(FEATURE_DTYPES), dtype=FEATURE_DTYPES, engine='c')
     
     print("=== ANALYSE DU FLUX SUSPECT ===")
     print(f"Nombre total de flux extraits: {len(df)}")
@@ -60,12 +127,12 @@ def analyze_suspicious_flow():
     
     # 3. Analyse de la durée vs paquets
     packets_total = suspicious_flow['spkts'] + suspicious_flow['dpkts']
-    if suspicious_flow['dur'] < 0.1 and packets_total < 5:
+    if suspicious_flow['dur'] < SHORT_DURATION and packets_total < FEW_PACKETS:
         print(f"⚠️  CONNEXION TRÈS COURTE: {suspicious_flow['dur']:.3f}s avec {packets_total} paquets")
         print("   → Tentative de connexion avortée rapidement")
     
     # 4. Analyse des fenêtres TCP
-    if suspicious_flow['swin'] < 50 or suspicious_flow['dwin'] < 300:
+    if suspicious_flow['swin'] < SMALL_SRC_WINDOW or suspicious_flow['dwin'] < SMALL_DST_WINDOW:
         print(f"⚠️  FENÊTRES TCP PETITES: source={suspicious_flow['swin']}, dest={suspicious_flow['dwin']}")
         print("   → Potentiel indicateur de scan ou connexion anormale")
     
@@ -85,58 +152,45 @@ def analyze_suspicious_flow():
     # Comparaison avec les autres flux
     print("=== COMPARAISON AVEC LES AUTRES FLUX ===")
     
-    # Statistiques des autres flux HTTPS
-    https_flows = df[df['service'] == 'https']
-    other_https = https_flows[https_flows.index != suspicious_flow.name]
+    # Statistiques des autres flux HTTPS (sous-ensemble et moyennes calculés une seule fois)
+    https_mask = (df['service'] == 'https').to_numpy()
+    other_https = df.loc[https_mask].drop(suspicious_flow.name, errors='ignore')
     
     if len(other_https) > 0:
+        https_summary = other_https.agg({
+            'dur': 'mean', 'spkts': 'mean', 'dpkts': 'mean',
+            'swin': 'mean', 'sttl': 'mean', 'dttl': 'mean', 'state': 'unique',
+        })
+        
         print("Flux HTTPS normaux dans le même PCAP:")
-        print(f"  Durée moyenne: {other_https['dur'].mean():.6f}s")
-        print(f"  Paquets moyens source: {other_https['spkts'].mean():.1f}")
-        print(f"  Paquets moyens dest: {other_https['dpkts'].mean():.1f}")
-        print(f"  États: {other_https['state'].unique()}")
-        print(f"  TTL source moyen: {other_https['sttl'].mean():.1f}")
-        print(f"  TTL dest moyen: {other_https['dttl'].mean():.1f}")
+        print(f"  Durée moyenne: {https_summary['dur']:.6f}s")
+        print(f"  Paquets moyens source: {https_summary['spkts']:.1f}")
+        print(f"  Paquets moyens dest: {https_summary['dpkts']:.1f}")
+        print(f"  États: {list(https_summary['state'])}")
+        print(f"  TTL source moyen: {https_summary['sttl']:.1f}")
+        print(f"  TTL dest moyen: {https_summary['dttl']:.1f}")
         print()
         
         # Comparaison directe
         print("Comparaison avec la moyenne des flux HTTPS normaux:")
-        if suspicious_flow['dur'] < other_https['dur'].mean() / 2:
-            print(f"  ⚠️  Durée anormalement courte: {suspicious_flow['dur']:.6f} vs {other_https['dur'].mean():.6f}")
+        if suspicious_flow['dur'] < https_summary['dur'] / 2:
+            print(f"  ⚠️  Durée anormalement courte: {suspicious_flow['dur']:.6f} vs {https_summary['dur']:.6f}")
         
-        if suspicious_flow['spkts'] < other_https['spkts'].mean() / 2:
-            print(f"  ⚠️  Très peu de paquets source: {suspicious_flow['spkts']} vs {other_https['spkts'].mean():.1f}")
+        if suspicious_flow['spkts'] < https_summary['spkts'] / 2:
+            print(f"  ⚠️  Très peu de paquets source: {suspicious_flow['spkts']} vs {https_summary['spkts']:.1f}")
         
-        if suspicious_flow['swin'] < other_https['swin'].mean() / 2:
-            print(f"  ⚠️  Fenêtre TCP source très petite: {suspicious_flow['swin']} vs {other_https['swin'].mean():.1f}")
+        if suspicious_flow['swin'] < https_summary['swin'] / 2:
+            print(f"  ⚠️  Fenêtre TCP source très petite: {suspicious_flow['swin']} vs {https_summary['swin']:.1f}")
     
     print()
     
     print("=== CONCLUSION ===")
-    score = 0
-    reasons = []
-    
-    if suspicious_flow['state'] == 'INT':
-        score += 2
-        reasons.append("Connexion interrompue")
-    
-    if suspicious_flow['sttl'] != suspicious_flow['dttl']:
-        score += 1
-        reasons.append("TTL différents")
-    
-    if suspicious_flow['dur'] < 0.1 and (suspicious_flow['spkts'] + suspicious_flow['dpkts']) < 5:
-        score += 2
-        reasons.append("Connexion très courte avec peu de paquets")
-    
-    if suspicious_flow['swin'] < 50:
-        score += 1
-        reasons.append("Fenêtre TCP source très petite")
-    
-    if (suspicious_flow['tcprtt'] == 0 and suspicious_flow['synack'] == 0):
-        score += 1
-        reasons.append("Temps de réponse TCP anormaux")
+    # Score de suspicion calculé pour tous les flux en une passe vectorisée
+    scores, flags = score_flows(df)
+    score = int(scores[-1])
+    reasons = [reason for bit, (reason, _) in enumerate(SUSPICION_RULES) if flags[-1] >> bit & 1]
     
-    print(f"Score de suspicion: {score}/7")
+    print(f"Score de suspicion: {score}/{MAX_SUSPICION_SCORE}")
     print(f"Probabilité détectée: 0.5312 (53.12%)")
     print()
     
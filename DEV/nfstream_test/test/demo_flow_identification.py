@@ -6,71 +6,198 @@ Ce script accompagne le Guide Flow_Identification_Guide.md
 """
 
 import pandas as pd
-from scapy.all import rdpcap, IP, TCP, UDP, ICMP
+import numpy as np
+import dpkt
+import socket
+import sys
+from array import array
 from collections import defaultdict, Counter
+from itertools import chain, islice
 import json
 
-def demonstrate_flow_identification():
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:  # Sans numba, l'agrégation passe par le groupby pandas
+    NUMBA_AVAILABLE = False
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+PCAP_FILE = "trafic.pcap"
+CSV_FILE = "unsw_nb15_features.csv"
+CSV_DTYPES = {
+    'dur': 'float32', 'proto': 'category', 'service': 'category', 'state': 'category',
+    'spkts': 'int32', 'dpkts': 'int32', 'sbytes': 'int64', 'dbytes': 'int64', 'rate': 'float32',
+}
+DEMO_PACKETS = 10
+
+# Dispatch par numéro de protocole IP : nom affiché et champs servant de "ports"
+PROTO_NAMES = {6: "TCP", 17: "UDP", 1: "ICMP"}
+PORT_FIELDS = {6: ('sport', 'dport'), 17: ('sport', 'dport'), 1: ('type', 'code')}
+
+def iter_pcap(path=PCAP_FILE):
+    """Itère sur les paquets (timestamp, buffer) du PCAP sans le charger en mémoire"""
+    with open(path, "rb") as f:
+        reader = dpkt.pcap.Reader(f)
+        if reader.datalink() != dpkt.pcap.DLT_EN10MB:
+            raise ValueError(f"type de lien {reader.datalink()} non supporté (capture Ethernet attendue)")
+        yield from reader
+
+def packet_ports(ip):
+    """Retourne (port source, port destination) du paquet IP (type/code pour ICMP, 0 sinon)"""
+    fields = PORT_FIELDS.get(ip.p)
+    try:
+        return getattr(ip.data, fields[0]), getattr(ip.data, fields[1])
+    except (TypeError, AttributeError):
+        return 0, 0
+
+def pack_endpoint(ip_bytes, port):
+    """Empaquette un endpoint (IPv4, port) dans un entier 64 bits : ip << 16 | port"""
+    return int.from_bytes(ip_bytes, 'big') << 16 | port
+
+def format_endpoint(endpoint):
+    """Reconvertit un endpoint empaqueté en 'ip:port'"""
+    return f"{socket.inet_ntoa((endpoint >> 16).to_bytes(4, 'big'))}:{endpoint & 0xFFFF}"
+
+def format_flow_key(flow_key):
+    """Représentation lisible d'une clé de flux (endpoint_a, endpoint_b, proto)"""
+    a, b, proto_id = flow_key
+    return f"({format_endpoint(a)}, {format_endpoint(b)}, proto={proto_id})"
+
+def load_packet_columns(packets):
+    """Parse les paquets en colonnes (une entrée par paquet IP) et retourne aussi le nombre total de paquets"""
+    src = array('Q')
+    dst = array('Q')
+    proto = array('B')
+    size = array('I')
+    total = 0
+    
+    for ts, buf in packets:
+        total += 1
+        ip = dpkt.ethernet.Ethernet(buf).data
+        if not isinstance(ip, dpkt.ip.IP):
+            continue
+        
+        sport, dport = packet_ports(ip)
+        src.append(pack_endpoint(ip.src, sport))
+        dst.append(pack_endpoint(ip.dst, dport))
+        proto.append(ip.p)
+        size.append(len(buf))
+    
+    columns = pd.DataFrame({
+        'src': np.frombuffer(src, dtype=np.uint64),
+        'dst': np.frombuffer(dst, dtype=np.uint64),
+        'proto': np.frombuffer(proto, dtype=np.uint8),
+        'size': np.frombuffer(size, dtype=np.uint32),
+    })
+    return columns, total
+
+@njit(cache=True)
+def _build_flows_kernel(src, dst, proto, size):
+    """Canonicalise les clés et cumule paquets/octets par flux en une passe"""
+    n = src.shape[0]
+    key_lo = np.empty(n, np.uint64)
+    key_hi = np.empty(n, np.uint64)
+    flow_proto = np.empty(n, np.uint8)
+    pkts = np.zeros(n, np.int64)
+    nbytes = np.zeros(n, np.int64)
+    flow_ids = dict()
+    n_flows = 0
+    
+    for i in range(n):
+        a = src[i]
+        b = dst[i]
+        if (proto[i] == 6 or proto[i] == 17) and b < a:
+            a, b = b, a
+        key = (a, b, proto[i])
+        if key in flow_ids:
+            f = flow_ids[key]
+        else:
+            f = n_flows
+            flow_ids[key] = f
+            key_lo[f] = a
+            key_hi[f] = b
+            flow_proto[f] = proto[i]
+            n_flows += 1
+        pkts[f] += 1
+        nbytes[f] += size[i]
+    
+    return key_lo[:n_flows], key_hi[:n_flows], flow_proto[:n_flows], pkts[:n_flows], nbytes[:n_flows]
+
+def aggregate_flows(columns):
+    """Agrège les paquets en flux (TCP/UDP bidirectionnels), via numba si disponible"""
+    if NUMBA_AVAILABLE:
+        key_lo, key_hi, proto, pkts, nbytes = _build_flows_kernel(
+            columns['src'].to_numpy(), columns['dst'].to_numpy(),
+            columns['proto'].to_numpy(), columns['size'].to_numpy()
+        )
+        index = pd.MultiIndex.from_arrays([key_lo, key_hi, proto], names=['key_lo', 'key_hi', 'proto'])
+        return pd.DataFrame({'pkts': pkts, 'bytes': nbytes}, index=index)
+    
+    src = columns['src'].to_numpy()
+    dst = columns['dst'].to_numpy()
+    bidirectional = np.isin(columns['proto'].to_numpy(), (6, 17))
+    
+    keyed = columns.assign(
+        key_lo=np.where(bidirectional, np.minimum(src, dst), src),
+        key_hi=np.where(bidirectional, np.maximum(src, dst), dst),
+    )
+    return keyed.groupby(['key_lo', 'key_hi', 'proto'], sort=False).agg(
+        pkts=('size', 'count'), bytes=('size', 'sum')
+    )
+
+def load_inputs():
+    """Lit le PCAP (une seule passe en streaming) et le CSV une seule fois pour toute la démonstration"""
+    packets = iter_pcap()
+    first_packets = list(islice(packets, DEMO_PACKETS))
+    packet_columns, packet_count = load_packet_columns(chain(first_packets, packets))
+    df = pd.read_csv(CSV_FILE, usecols=list(CSV_DTYPES), dtype=CSV_DTYPES, engine='c')
+    return first_packets, packet_columns, packet_count, df
+
+def demonstrate_flow_identification(packets):
     """
     Démonstration interactive de l'identification des flux
     """
     print("🎯 DÉMONSTRATION : IDENTIFICATION DES FLUX RÉSEAU")
     print("=" * 60)
-    
-    # Charger le PCAP
-    try:
-        packets = rdpcap("trafic.pcap")
-        print(f"📁 Fichier chargé: trafic.pcap ({len(packets)} paquets)")
-    except:
-        print("❌ Erreur: fichier trafic.pcap non trouvé")
-        return
+    print(f"📁 Fichier chargé: {PCAP_FILE}")
     
     # Structures pour l'analyse
     flows = defaultdict(list)
     protocols = Counter()
+    ip_count = 0
     
-    print(f"\n🔍 ANALYSE PAQUET PAR PAQUET (10 premiers):")
+    print(f"\n🔍 ANALYSE PAQUET PAR PAQUET ({DEMO_PACKETS} premiers):")
     print("-" * 60)
     
-    for i, pkt in enumerate(packets[:10]):
-        if IP not in pkt:
+    for i, (ts, buf) in enumerate(packets):
+        ip = dpkt.ethernet.Ethernet(buf).data
+        if not isinstance(ip, dpkt.ip.IP):
             continue
-            
+        ip_count += 1
+        
         # Extraire les informations
-        src_ip = pkt[IP].src
-        dst_ip = pkt[IP].dst
-        protocol = pkt[IP].proto
+        src_ip = socket.inet_ntoa(ip.src)
+        dst_ip = socket.inet_ntoa(ip.dst)
+        protocol = ip.p
         
-        if TCP in pkt:
-            src_port = pkt[TCP].sport
-            dst_port = pkt[TCP].dport
-            proto_name = "TCP"
-        elif UDP in pkt:
-            src_port = pkt[UDP].sport
-            dst_port = pkt[UDP].dport
-            proto_name = "UDP"
-        elif ICMP in pkt:
-            src_port = pkt[ICMP].type
-            dst_port = pkt[ICMP].code
-            proto_name = "ICMP"
-        else:
-            src_port = 0
-            dst_port = 0
-            proto_name = f"Proto-{protocol}"
+        src_port, dst_port = packet_ports(ip)
+        proto_name = PROTO_NAMES.get(protocol, f"Proto-{protocol}")
         
         protocols[proto_name] += 1
         
-        # Créer la clé de flux
+        # Créer la clé de flux (endpoints empaquetés en entiers, protocole numérique)
+        a = pack_endpoint(ip.src, src_port)
+        b = pack_endpoint(ip.dst, dst_port)
         if proto_name in ["TCP", "UDP"]:
-            # Bidirectionnel : trier les endpoints
-            flow_key = tuple(sorted([
-                (src_ip, src_port),
-                (dst_ip, dst_port)
-            ]))
+            # Bidirectionnel : ordonner les endpoints
+            flow_key = (min(a, b), max(a, b), protocol)
             direction = "↔"
         else:
             # Directionnel pour ICMP/autres
-            flow_key = ((src_ip, src_port), (dst_ip, dst_port))
+            flow_key = (a, b, protocol)
             direction = "→"
         
         flows[flow_key].append({
@@ -78,32 +205,33 @@ def demonstrate_flow_identification():
             'src': f"{src_ip}:{src_port}",
             'dst': f"{dst_ip}:{dst_port}",
             'proto': proto_name,
-            'size': len(pkt)
+            'size': len(buf)
         })
         
         print(f"📦 Paquet #{i+1:2d}: {src_ip}:{src_port} {direction} {dst_ip}:{dst_port} ({proto_name})")
-        print(f"   🔑 Clé de flux: {flow_key}")
-        print(f"   📏 Taille: {len(pkt)} bytes")
+        print(f"   🔑 Clé de flux: {format_flow_key(flow_key)}")
+        print(f"   📏 Taille: {len(buf)} bytes")
         print()
     
     print(f"📊 RÉSULTATS DE L'AGRÉGATION:")
     print("-" * 60)
-    print(f"Total paquets analysés: {len([p for p in packets[:10] if IP in p])}")
+    print(f"Total paquets analysés: {ip_count}")
     print(f"Flux uniques identifiés: {len(flows)}")
     print(f"Protocoles détectés: {dict(protocols)}")
     
     print(f"\n🌊 DÉTAIL DES FLUX:")
     print("-" * 60)
+    lines = []
     for i, (flow_key, pkts) in enumerate(flows.items(), 1):
-        first_pkt = pkts[0]
-        print(f"Flux {i}: {flow_key}")
-        print(f"├── Protocole: {first_pkt['proto']}")
-        print(f"├── Paquets: {len(pkts)}")
-        print(f"├── Taille totale: {sum(p['size'] for p in pkts)} bytes")
-        print(f"└── Numéros: {[p['packet_num'] for p in pkts]}")
-        print()
+        lines.append(f"Flux {i}: {format_flow_key(flow_key)}")
+        lines.append(f"├── Protocole: {pkts[0]['proto']}")
+        lines.append(f"├── Paquets: {len(pkts)}")
+        lines.append(f"├── Taille totale: {sum(p['size'] for p in pkts)} bytes")
+        lines.append(f"└── Numéros: {[p['packet_num'] for p in pkts]}")
+        lines.append("")
+    sys.stdout.write("\n".join(lines) + "\n" if lines else "")
 
-def compare_with_csv():
+def compare_with_csv(packet_columns, packet_count, df):
     """
     Compare avec le résultat final CSV
     """
@@ -111,24 +239,28 @@ def compare_with_csv():
     print("-" * 60)
     
     try:
-        df = pd.read_csv("unsw_nb15_features.csv")
-        packets = rdpcap("trafic.pcap")
+        pcap_flows = aggregate_flows(packet_columns)
         
-        print(f"Paquets PCAP: {len(packets)}")
+        print(f"Paquets PCAP: {packet_count}")
+        print(f"Flux PCAP (agrégation complète): {len(pcap_flows)}")
         print(f"Flux CSV: {len(df)}")
         print(f"Paquets CSV: {df['spkts'].sum() + df['dpkts'].sum()}")
         
         print(f"\n📈 FLUX FINAUX:")
-        for i, row in df.iterrows():
-            print(f"Flux {i+1}:")
-            print(f"├── Protocole: {row['proto']}")
-            print(f"├── Service: {row['service']}")
-            print(f"├── État: {row['state']}")
-            print(f"├── Durée: {row['dur']:.3f}s")
-            print(f"├── Paquets: {row['spkts']} → + {row['dpkts']} ← = {row['spkts'] + row['dpkts']}")
-            print(f"├── Bytes: {row['sbytes']} → + {row['dbytes']} ← = {row['sbytes'] + row['dbytes']}")
-            print(f"└── Rate: {row['rate']:.2f}")
-            print()
+        rows = df[['proto', 'service', 'state', 'dur', 'spkts', 'dpkts', 'sbytes', 'dbytes', 'rate']].itertuples(index=False, name=None)
+        # Un seul write pour tout le bloc (un print par ligne coûte cher sur un gros CSV)
+        sys.stdout.write("".join(
+            f"Flux {i}:\n"
+            f"├── Protocole: {proto}\n"
+            f"├── Service: {service}\n"
+            f"├── État: {state}\n"
+            f"├── Durée: {dur:.3f}s\n"
+            f"├── Paquets: {spkts} → + {dpkts} ← = {spkts + dpkts}\n"
+            f"├── Bytes: {sbytes} → + {dbytes} ← = {sbytes + dbytes}\n"
+            f"└── Rate: {rate:.2f}\n"
+            f"\n"
+            for i, (proto, service, state, dur, spkts, dpkts, sbytes, dbytes, rate) in enumerate(rows, 1)
+        ))
             
     except Exception as e:
         print(f"❌ Erreur lors de la lecture du CSV: {e}")
@@ -148,7 +280,7 @@ def explain_aggregation_rules():
             Paquet 1: 192.168.1.2:20103 → 172.65.251.78:443 (TCP)
             Paquet 2: 172.65.251.78:443 → 192.168.1.2:20103 (TCP)
             → MÊME FLUX car endpoints identiques""",
-            "key_format": "tuple(sorted([(src_ip, src_port), (dst_ip, dst_port)]))"
+            "key_format": "(min(a, b), max(a, b), proto) avec a/b = ip << 16 | port"
         },
         "ICMP": {
             "description": "Agrégation directionnelle",
@@ -226,9 +358,15 @@ def analyze_suspicious_flow():
     print(f"  • Asymétrie peut être due à des timeouts réseau")
 
 if __name__ == "__main__":
-    demonstrate_flow_identification()
+    try:
+        first_packets, packet_columns, packet_count, df = load_inputs()
+    except (OSError, ValueError, dpkt.NeedData, dpkt.UnpackError) as e:
+        print(f"❌ Erreur lors du chargement de {PCAP_FILE} / {CSV_FILE}: {e}")
+        raise SystemExit(1)
+    
+    demonstrate_flow_identification(first_packets)
     explain_aggregation_rules()
-    compare_with_csv()
+    compare_with_csv(packet_columns, packet_count, df)
     analyze_suspicious_flow()
     
     print(f"\n📖 Pour plus de détails, consultez Flow_Identification_Guide.md")
@@ -63,16 +63,20 @@ try:
     
     # Préparation des features et target
     if 'label' in data.columns:
-        # Features numériques seulement pour ce test
-        X = data[numeric_cols].drop('label', axis=1) if 'label' in numeric_cols else data[numeric_cols]
-        y = data['label']
+        # Features numériques seulement pour ce test (matrice float32, acceptée telle quelle par sklearn)
+        feature_cols = [col for col in numeric_cols if col != 'label']
+        X = data[feature_cols].to_numpy(dtype=np.float32)
+        y = data['label'].to_numpy(dtype=np.uint8)
         
-        # Gestion des valeurs manquantes
-        X = X.fillna(X.median())
+        # Gestion des valeurs manquantes : médiane par colonne, remplacement en place
+        medians = np.nanmedian(X, axis=0)
+        nan_rows, nan_cols = np.where(np.isnan(X))
+        X[nan_rows, nan_cols] = medians[nan_cols]
         
         print(f"✅ Features préparées: {X.shape}")
         print(f"✅ Target préparée: {y.shape}")
-        print(f"📊 Répartition target: {y.value_counts().to_dict()}")
+        classes, counts = np.unique(y, return_counts=True)
+        print(f"📊 Répartition target: {dict(zip(classes.tolist(), counts.tolist()))}")
         
     else:
         print("❌ Impossible de préparer les données sans colonne 'label'")
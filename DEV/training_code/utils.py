@@ -17,7 +17,7 @@ from tqdm import tqdm
 
 from sklearn.preprocessing import LabelEncoder, StandardScaler
 from sklearn.model_selection import train_test_split, learning_curve, RandomizedSearchCV
-from sklearn.metrics import accuracy_score, log_loss, precision_score, recall_score, f1_score, confusion_matrix
+from sklearn.metrics import accuracy_score, log_loss
 from sklearn.neighbors import KNeighborsClassifier
 from sklearn.neural_network import MLPClassifier
 from sklearn.exceptions import ConvergenceWarning
@@ -27,6 +27,27 @@ warnings.filterwarnings('ignore', category=UserWarning)
 warnings.filterwarnings('ignore', category=FutureWarning)
 warnings.filterwarnings('ignore', category=ConvergenceWarning)
 
+def binary_classification_metrics(y_true, y_pred):
+    """
+    Calcule accuracy, precision, recall, F1 et matrice de confusion en une seule passe
+    Args:
+        y_true: Étiquettes réelles (0 = normal, 1 = attaque)
+        y_pred: Étiquettes prédites
+    Returns:
+        accuracy, precision, recall, f1, matrice de confusion 2x2 [[tn, fp], [fn, tp]]
+    """
+    # Un seul bincount sur 2*y_true + y_pred donne tn, fp, fn, tp
+    codes = 2 * np.asarray(y_true, dtype=np.int64) + np.asarray(y_pred, dtype=np.int64)
+    conf_matrix = np.bincount(codes, minlength=4).reshape(2, 2)
+    (tn, fp), (fn, tp) = conf_matrix
+    
+    # Mêmes conventions que sklearn avec zero_division=0
+    accuracy = (tp + tn) / conf_matrix.sum() if conf_matrix.sum() else 0.0
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    f1 = 2 * tp / (2 * tp + fp + fn) if tp + fp + fn else 0.0
+    return accuracy, precision, recall, f1, conf_matrix
+
 def load_and_preprocess_data(filepath, test_size=0.2, val_size=0.15, random_state=42):
     """
     Charge et prétraite les données pour l'entraînement
@@ -77,12 +98,12 @@ def load_and_preprocess_data(filepath, test_size=0.2, val_size=0.15, random_stat
     
     # Séparer les caractéristiques et les étiquettes
     X = df_processed.drop(columns=['label'], errors='ignore')
-    y = df_processed['label']  # 0 pour normal, 1 pour attaque
+    y = df_processed['label'].to_numpy(dtype=np.uint8)  # 0 pour normal, 1 pour attaque
     
     # Vérifier la distribution des classes
-    class_counts = y.value_counts()
+    classes, counts = np.unique(y, return_counts=True)
     print(f"Distribution des classes:")
-    for cls, count in class_counts.items():
+    for cls, count in zip(classes, counts):
         print(f"  - Classe {cls}: {count} échantillons ({count/len(y)*100:.2f}%)")
     
     # Encoder les caractéristiques catégorielles
@@ -98,8 +119,9 @@ def load_and_preprocess_data(filepath, test_size=0.2, val_size=0.15, random_stat
             label_encoders[col] = le
     
     # Mise à l'échelle des caractéristiques numériques
+    # Matrice float32 passée directement au scaler (moitié moins de mémoire que float64)
     scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
+    X_scaled = scaler.fit_transform(X.to_numpy(dtype=np.float32))
     
     # Division en ensembles d'entraînement, validation et test avec stratification
     try:
@@ -416,10 +438,7 @@ def train_knn_progressive(X_train, y_train, X_val, y_val, X_test, y_test, best_p
                 
                 # Évaluation sur l'ensemble d'entraînement
                 train_preds = model.predict(X_train_epoch)
-                train_acc = accuracy_score(y_train_epoch, train_preds)
-                train_prec = precision_score(y_train_epoch, train_preds, zero_division=0)
-                train_rec = recall_score(y_train_epoch, train_preds, zero_division=0)
-                train_f1 = f1_score(y_train_epoch, train_preds, zero_division=0)
+                train_acc, train_prec, train_rec, train_f1, _ = binary_classification_metrics(y_train_epoch, train_preds)
                 train_accuracies.append(train_acc)
                 train_precisions.append(train_prec)
                 train_recalls.append(train_rec)
@@ -427,10 +446,7 @@ def train_knn_progressive(X_train, y_train, X_val, y_val, X_test, y_test, best_p
                 
                 # Évaluation sur l'ensemble de validation
                 val_preds = model.predict(X_val)
-                val_acc = accuracy_score(y_val, val_preds)
-                val_prec = precision_score(y_val, val_preds, zero_division=0)
-                val_rec = recall_score(y_val, val_preds, zero_division=0)
-                val_f1 = f1_score(y_val, val_preds, zero_division=0)
+                val_acc, val_prec, val_rec, val_f1, _ = binary_classification_metrics(y_val, val_preds)
                 val_accuracies.append(val_acc)
                 val_precisions.append(val_prec)
                 val_recalls.append(val_rec)
@@ -486,13 +502,8 @@ def train_knn_progressive(X_train, y_train, X_val, y_val, X_test, y_test, best_p
     
     # Évaluation finale du meilleur modèle sur l'ensemble de test
     test_pred = best_model.predict(X_test)
-    test_accuracy = accuracy_score(y_test, test_pred)
-    test_precision = precision_score(y_test, test_pred, zero_division=0)
-    test_recall = recall_score(y_test, test_pred, zero_division=0)
-    test_f1 = f1_score(y_test, test_pred, zero_division=0)
-    
-    # Calculer la matrice de confusion
-    conf_matrix = confusion_matrix(y_test, test_pred)
+    # Métriques et matrice de confusion en une seule passe
+    test_accuracy, test_precision, test_recall, test_f1, conf_matrix = binary_classification_metrics(y_test, test_pred)
     
     # Tracer les courbes d'apprentissage
     try:
@@ -7,6 +7,47 @@ import pandas as pd
 import numpy as np
 from collections import defaultdict, Counter
 import re
+import array
+from multiprocessing import Pool
+
+# Nombre d'octets du payload inspectés pour deviner le service
+SERVICE_SNIFF_BYTES = 64
+
+# Sens d'un paquet dans son flow (index dans les tuples de clés par direction)
+FORWARD = 0
+REVERSE = 1
+
+# Clés de features indexées par direction
+_TCP_WIN_KEYS = ('swin', 'dwin')
+_TCP_SEQ_KEYS = ('stcpb', 'dtcpb')
+
+# Bits des flags TCP
+TCP_FIN = 0x01
+TCP_SYN = 0x02
+TCP_RST = 0x04
+TCP_ACK = 0x10
+
+# Motifs applicatifs précompilés, appliqués directement sur les bytes du payload
+_HTTP_METHOD_RE = re.compile(rb'(?:GET|POST|PUT|DELETE) ')
+_HTTP_VERSION = b'HTTP/1.'
+_CONTENT_LENGTH_RE = re.compile(rb'Content-Length:\s*(\d+)')
+_FTP_LOGIN_RE = re.compile(rb'(?:USER|PASS) ')
+_FTP_CMD_RE = re.compile(rb'(?:USER|PASS|LIST|RETR|STOR|CWD|PWD|QUIT) ')
+
+# Features catégorielles (stockées en dtype 'category')
+_CATEGORICAL_FEATURES = ['proto', 'service', 'state']
+
+# Features de connection tracking comptées par groupby : colonnes de regroupement
+_CT_GROUP_KEYS = {
+    'ct_srv_src': ['service', 'src_ip'],
+    'ct_srv_dst': ['service', 'dst_ip'],
+    'ct_dst_ltm': ['dst_ip'],
+    'ct_src_ltm': ['src_ip'],
+    'ct_src_dport_ltm': ['src_ip', 'dport'],
+    'ct_dst_sport_ltm': ['dst_ip', 'sport'],
+    'ct_dst_src_ltm': ['src_ip', 'dst_ip'],
+}
+
 
 class UNSW_NB15_FeatureExtractor:
     """
@@ -14,9 +55,10 @@ class UNSW_NB15_FeatureExtractor:
     Calcule les 42 features exactes requises par les modèles ML
     """
     def __init__(self):
-        # Use method reference to ensure a fresh flow is created each time
-        self.flows = defaultdict(self._create_empty_flow)
+        # Flows créés à la demande dans _first_pass_analysis
+        self.flows = {}
         self.connection_tracking = defaultdict(lambda: defaultdict(int))
+        self._ip_handlers = (self._analyze_ip_forward, self._analyze_ip_reverse)
         self.service_ports = {
             20: 'ftp-data', 21: 'ftp', 22: 'ssh', 23: 'telnet', 25: 'smtp',
             53: 'dns', 80: 'http', 110: 'pop3', 143: 'imap', 443: 'https',
@@ -90,30 +132,20 @@ class UNSW_NB15_FeatureExtractor:
             'is_sm_ips_ports': 0,
             
             # Internal tracking
-            '_packets': [],
+            '_npackets': 0,
             '_first_time': None,
             '_last_time': None,
-            '_src_packets': [],
-            '_dst_packets': [],
-            '_tcp_flags': [],
+            # Intervalles inter-paquets par direction (8 octets par intervalle, pas d'objets paquet)
+            '_src_last_time': None,
+            '_src_intervals': array.array('d'),
+            '_dst_last_time': None,
+            '_dst_intervals': array.array('d'),
+            '_tcp_flags': array.array('B'),  # un octet de flags par paquet TCP
             '_direction': None
         }
         
         return flow
     
-    def _ensure_flow_integrity(self, flow):
-        """S'assurer que le flow a tous les attributs requis"""
-        required_tracking_attrs = ['_packets', '_first_time', '_last_time', '_src_packets', '_dst_packets', '_tcp_flags', '_direction']
-        
-        for attr in required_tracking_attrs:
-            if attr not in flow:
-                if attr in ['_first_time', '_last_time', '_direction']:
-                    flow[attr] = None
-                else:
-                    flow[attr] = []
-        
-        return flow
-
     def reset_flows(self):
         """Remet à zéro l'extracteur pour un nouveau batch"""
         self.flows.clear()
@@ -145,26 +177,25 @@ class UNSW_NB15_FeatureExtractor:
         endpoint2 = (dst_ip, dst_port)
         
         if endpoint1 < endpoint2:
-            return (endpoint1, endpoint2, 'forward')
+            return (endpoint1, endpoint2, FORWARD)
         else:
-            return (endpoint2, endpoint1, 'reverse')
+            return (endpoint2, endpoint1, REVERSE)
     
     def _detect_service(self, src_port, dst_port, payload=None):
         """Détecte le service basé sur les ports et le payload"""
-        # Vérifier les ports standards
-        if dst_port in self.service_ports:
-            return self.service_ports[dst_port]
-        elif src_port in self.service_ports:
-            return self.service_ports[src_port]
+        # Vérifier les ports standards (le payload n'est alors pas inspecté)
+        service = self.service_ports.get(dst_port) or self.service_ports.get(src_port)
+        if service:
+            return service
             
-        # Détection basée sur le payload
+        # Détection basée sur le début du payload (bytes bruts)
         if payload:
-            payload_str = str(payload).lower()
-            if 'http' in payload_str or 'get ' in payload_str or 'post ' in payload_str:
+            head = payload[:SERVICE_SNIFF_BYTES].lower()
+            if b'http' in head or b'get ' in head or b'post ' in head:
                 return 'http'
-            elif 'ftp' in payload_str:
+            elif b'ftp' in head:
                 return 'ftp'
-            elif 'smtp' in payload_str:
+            elif b'smtp' in head:
                 return 'smtp'
                 
         return '-'
@@ -174,59 +205,26 @@ class UNSW_NB15_FeatureExtractor:
         if not tcp_flags_list:
             return 'INT'
             
-        flags = set()
-        for flag in tcp_flags_list:
-            flags.update(flag)
+        # OR de tous les octets de flags du flow, lus sans copie depuis l'array.array
+        flags = int(np.bitwise_or.reduce(np.frombuffer(tcp_flags_list, dtype=np.uint8)))
             
-        if 'F' in flags:  # FIN
+        if flags & TCP_FIN:
             return 'FIN'
-        elif 'R' in flags:  # RST
+        elif flags & TCP_RST:
             return 'RST'
-        elif 'S' in flags and 'A' in flags:  # SYN-ACK sequence
+        elif flags & TCP_SYN and flags & TCP_ACK:  # SYN-ACK sequence
             return 'CON'
-        elif 'S' in flags:  # SYN only
+        elif flags & TCP_SYN:  # SYN only
             return 'REQ'
         else:
             return 'INT'
     
-    def _calculate_jitter(self, times):
-        """Calcule le jitter (variation du délai)"""
-        if len(times) < 2:
-            return 0.0
-            
-        delays = []
-        for i in range(1, len(times)):
-            delays.append(abs(times[i] - times[i-1]))
-            
-        if len(delays) < 2:
-            return 0.0
-            
-        mean_delay = np.mean(delays)
-        jitter = np.mean([abs(d - mean_delay) for d in delays])
-        return float(jitter)
-    
-    def _extract_tcp_flags_string(self, packet):
-        """Extrait les flags TCP sous forme de string"""
+    def _extract_tcp_flags(self, packet):
+        """Extrait l'octet des flags TCP (FIN, SYN, RST, PSH, ACK, URG)"""
         if TCP not in packet:
-            return ''
-            
-        tcp_layer = packet[TCP]
-        flags = []
-        
-        if tcp_layer.flags & 0x01:  # FIN
-            flags.append('F')
-        if tcp_layer.flags & 0x02:  # SYN
-            flags.append('S')
-        if tcp_layer.flags & 0x04:  # RST
-            flags.append('R')
-        if tcp_layer.flags & 0x08:  # PSH
-            flags.append('P')
-        if tcp_layer.flags & 0x10:  # ACK
-            flags.append('A')
-        if tcp_layer.flags & 0x20:  # URG
-            flags.append('U')
+            return 0
             
-        return ''.join(flags)
+        return int(packet[TCP].flags) & 0x3F
     
     def process_pcap(self, pcap_file):
         """Traite un fichier PCAP et extrait toutes les features UNSW-NB15"""
@@ -254,33 +252,47 @@ class UNSW_NB15_FeatureExtractor:
         print(f"✅ {len(df)} flows extraits avec {len(df.columns)} features")
         return df
     
+    @staticmethod
+    def process_pcap_parallel(pcap_files, n_workers=None):
+        """Traite plusieurs fichiers PCAP en parallèle, un fichier par processus
+        
+        Chaque fichier est traité par un extracteur indépendant : les flows ne
+        doivent donc pas être répartis sur plusieurs fichiers.
+        """
+        if not pcap_files:
+            return pd.DataFrame()
+            
+        print(f"🔄 Extraction parallèle de {len(pcap_files)} fichiers PCAP")
+        with Pool(processes=n_workers) as pool:
+            dfs = pool.map(_extract_pcap_worker, pcap_files)
+        
+        dfs = [df for df in dfs if len(df) > 0]
+        if not dfs:
+            return pd.DataFrame()
+            
+        df = pd.concat(dfs, ignore_index=True)
+        # concat repasse en object les catégories qui diffèrent entre fichiers
+        for feature in _CATEGORICAL_FEATURES:
+            df[feature] = df[feature].astype('category')
+        
+        print(f"✅ {len(df)} flows extraits de {len(dfs)} fichiers")
+        return df
+    
     def _first_pass_analysis(self, packets):
         """Première passe : collecter les données de base de chaque paquet"""
-        for i, packet in enumerate(packets):
-            if i % 1000 == 0 and i > 0:
-                print(f"   Traité {i} paquets...")
-                            
+        for packet in packets:
             flow_key = self._get_flow_key(packet)
             if not flow_key:
                 continue
                 
             key, direction = flow_key[:-1], flow_key[-1]
-            flow = self.flows[key]
-            
-            # S'assurer que le flow est correctement initialisé
-            flow = self._ensure_flow_integrity(flow)
+            flow = self.flows.get(key)
+            if flow is None:
+                flow = self.flows[key] = self._create_empty_flow()
             
             # Enregistrer le paquet
             packet_time = float(packet.time)
-            packet_size = len(packet)
-            
-            try:
-                flow['_packets'].append((packet_time, packet_size, direction, packet))
-            except KeyError as e:
-                print(f"❌ ERREUR KeyError lors de l'ajout de paquet: {e}")
-                print(f"🔍 Flow keys: {list(flow.keys()) if isinstance(flow, dict) else 'NOT A DICT'}")
-                print(f"🔍 Flow type: {type(flow)}")
-                raise
+            flow['_npackets'] += 1
             
             # Initialiser les temps
             if flow['_first_time'] is None:
@@ -290,7 +302,7 @@ class UNSW_NB15_FeatureExtractor:
 
             # Analyser le paquet IP
             if IP in packet:
-                self._analyze_ip_packet(packet, flow, direction)
+                self._ip_handlers[direction](packet, flow)
                 
             # Analyser selon le protocole
             if TCP in packet:
@@ -300,11 +312,8 @@ class UNSW_NB15_FeatureExtractor:
             elif ARP in packet:
                 self._analyze_arp_packet(packet, flow, direction)
     
-    def _analyze_ip_packet(self, packet, flow, direction):
-        """Analyse un paquet IP"""
-        ip_layer = packet[IP]
-        
-        # Protocole
+    def _detect_protocol(self, packet, flow):
+        """Détermine le protocole du flow au premier paquet"""
         if not flow['proto']:
             if TCP in packet:
                 flow['proto'] = 'tcp'
@@ -314,25 +323,39 @@ class UNSW_NB15_FeatureExtractor:
                 flow['proto'] = 'icmp'
             else:
                 flow['proto'] = 'other'
+    
+    def _analyze_ip_forward(self, packet, flow):
+        """Analyse un paquet IP émis par la source du flow"""
+        self._detect_protocol(packet, flow)
         
         # TTL
-        if direction == 'forward':
-            if flow['sttl'] == 0:
-                flow['sttl'] = ip_layer.ttl
-        else:
-            if flow['dttl'] == 0:
-                flow['dttl'] = ip_layer.ttl
+        if flow['sttl'] == 0:
+            flow['sttl'] = packet[IP].ttl
         
         # Compter paquets et bytes
-        packet_size = len(packet)
-        if direction == 'forward':
-            flow['spkts'] += 1
-            flow['sbytes'] += packet_size
-            flow['_src_packets'].append((float(packet.time), packet_size))
-        else:
-            flow['dpkts'] += 1
-            flow['dbytes'] += packet_size
-            flow['_dst_packets'].append((float(packet.time), packet_size))
+        flow['spkts'] += 1
+        flow['sbytes'] += len(packet)
+        self._update_inter_packet(flow, '_src_last_time', '_src_intervals', float(packet.time))
+    
+    def _analyze_ip_reverse(self, packet, flow):
+        """Analyse un paquet IP émis par la destination du flow"""
+        self._detect_protocol(packet, flow)
+        
+        # TTL
+        if flow['dttl'] == 0:
+            flow['dttl'] = packet[IP].ttl
+        
+        # Compter paquets et bytes
+        flow['dpkts'] += 1
+        flow['dbytes'] += len(packet)
+        self._update_inter_packet(flow, '_dst_last_time', '_dst_intervals', float(packet.time))
+    
+    def _update_inter_packet(self, flow, last_key, intervals_key, packet_time):
+        """Enregistre l'intervalle depuis le paquet précédent de la même direction"""
+        last_time = flow[last_key]
+        flow[last_key] = packet_time
+        if last_time is not None:
+            flow[intervals_key].append(packet_time - last_time)
     
     def _analyze_tcp_packet(self, packet, flow, direction):
         """Analyse un paquet TCP"""
@@ -346,22 +369,15 @@ class UNSW_NB15_FeatureExtractor:
             flow['service'] = self._detect_service(tcp_layer.sport, tcp_layer.dport, payload)
         
         # TCP flags
-        flags = self._extract_tcp_flags_string(packet)
-        flow['_tcp_flags'].append(flags)
+        flow['_tcp_flags'].append(self._extract_tcp_flags(packet))
         
         # TCP window
-        if direction == 'forward':
-            if flow['swin'] == 0:
-                flow['swin'] = tcp_layer.window
-        else:
-            if flow['dwin'] == 0:
-                flow['dwin'] = tcp_layer.window
+        win_key = _TCP_WIN_KEYS[direction]
+        if flow[win_key] == 0:
+            flow[win_key] = tcp_layer.window
         
         # Sequence numbers pour RTT calculation
-        if direction == 'forward':
-            flow['stcpb'] = tcp_layer.seq
-        else:
-            flow['dtcpb'] = tcp_layer.seq
+        flow[_TCP_SEQ_KEYS[direction]] = tcp_layer.seq
             
         # Analyser le payload pour HTTP
         if Raw in packet and flow['service'] == 'http':
@@ -389,61 +405,41 @@ class UNSW_NB15_FeatureExtractor:
         flow['state'] = 'INT'
     
     def _analyze_http_payload(self, payload, flow):
-        """Analyse le payload HTTP"""
-        try:
-            payload_str = payload.decode('utf-8', errors='ignore')
-            
-            # Compter les requêtes HTTP
-            if any(method in payload_str for method in ['GET ', 'POST ', 'PUT ', 'DELETE ']):
-                flow['ct_flw_http_mthd'] += 1
-                
-            # Estimer la profondeur de transaction
-            if 'HTTP/1.' in payload_str:
-                flow['trans_depth'] += 1
-                
-            # Estimer la longueur du body de réponse
-            if 'Content-Length:' in payload_str:
-                match = re.search(r'Content-Length:\s*(\d+)', payload_str)
-                if match:
-                    flow['response_body_len'] += int(match.group(1))
-                    
-        except Exception:
-            pass
+        """Analyse le payload HTTP (bytes bruts, sans décodage)"""
+        # Compter les requêtes HTTP
+        if _HTTP_METHOD_RE.search(payload):
+            flow['ct_flw_http_mthd'] += 1
+            
+        # Estimer la profondeur de transaction
+        if _HTTP_VERSION in payload:
+            flow['trans_depth'] += 1
+            
+        # Estimer la longueur du body de réponse
+        match = _CONTENT_LENGTH_RE.search(payload)
+        if match:
+            flow['response_body_len'] += int(match.group(1))
     
     def _analyze_ftp_payload(self, payload, flow):
-        """Analyse le payload FTP"""
-        try:
-            payload_str = payload.decode('utf-8', errors='ignore')
-            
-            # Détecter login FTP
-            if 'USER ' in payload_str or 'PASS ' in payload_str:
-                flow['is_ftp_login'] = 1
-                
-            # Compter les commandes FTP
-            ftp_commands = ['USER', 'PASS', 'LIST', 'RETR', 'STOR', 'CWD', 'PWD', 'QUIT']
-            for cmd in ftp_commands:
-                if f'{cmd} ' in payload_str:
-                    flow['ct_ftp_cmd'] += 1
-                    break
-                    
-        except Exception:
-            pass
+        """Analyse le payload FTP (bytes bruts, sans décodage)"""
+        # Détecter login FTP
+        if _FTP_LOGIN_RE.search(payload):
+            flow['is_ftp_login'] = 1
+            
+        # Compter les commandes FTP
+        if _FTP_CMD_RE.search(payload):
+            flow['ct_ftp_cmd'] += 1
     
     def _second_pass_features(self):
         """Calcule les features avancées pour chaque flow"""
-        for key, flow in self.flows.items():
-            # S'assurer que le flow est correctement structuré
-            flow = self._ensure_flow_integrity(flow)
-            self.flows[key] = flow  # Mettre à jour le flow dans le dictionnaire
-            
+        flows = list(self.flows.values())
+        for flow in flows:
             self._calculate_timing_features(flow)
             self._calculate_statistical_features(flow)
-            self._calculate_connection_tracking_features(flow, key)
             self._finalize_flow_features(flow)
 
     def _calculate_timing_features(self, flow):
         """Calcule les features de timing"""
-        if not flow['_packets']:
+        if not flow['_npackets']:
             return
             
         # Durée
@@ -460,18 +456,23 @@ class UNSW_NB15_FeatureExtractor:
             flow['sload'] = flow['sbytes'] / flow['dur']
             flow['dload'] = flow['dbytes'] / flow['dur']
         
-        # Inter-packet times
-        if len(flow['_src_packets']) >= 2:
-            src_times = [p[0] for p in flow['_src_packets']]
-            intervals = [src_times[i] - src_times[i-1] for i in range(1, len(src_times))]
-            flow['sinpkt'] = np.mean(intervals) if intervals else 0.0
-            flow['sjit'] = self._calculate_jitter(src_times)
+        # Inter-packet times et jitter
+        if flow['_src_intervals']:
+            flow['sinpkt'], flow['sjit'] = self._calculate_jitter(flow['_src_intervals'])
             
-        if len(flow['_dst_packets']) >= 2:
-            dst_times = [p[0] for p in flow['_dst_packets']]
-            intervals = [dst_times[i] - dst_times[i-1] for i in range(1, len(dst_times))]
-            flow['dinpkt'] = np.mean(intervals) if intervals else 0.0
-            flow['djit'] = self._calculate_jitter(dst_times)
+        if flow['_dst_intervals']:
+            flow['dinpkt'], flow['djit'] = self._calculate_jitter(flow['_dst_intervals'])
+    
+    def _calculate_jitter(self, intervals):
+        """Retourne (intervalle moyen, jitter = écart absolu moyen des délais à leur moyenne)"""
+        # Intervalles lus sans copie depuis l'array.array
+        intervals = np.frombuffer(intervals, dtype=np.float64)
+        mean_interval = float(intervals.mean())
+        if len(intervals) < 2:
+            return mean_interval, 0.0
+            
+        delays = np.abs(intervals)
+        return mean_interval, float(np.abs(delays - delays.mean()).mean())
     
     def _calculate_statistical_features(self, flow):
         """Calcule les features statistiques"""
@@ -490,26 +491,21 @@ class UNSW_NB15_FeatureExtractor:
         flow['sloss'] = 0
         flow['dloss'] = 0
 
-    def _calculate_connection_tracking_features(self, flow, flow_key):
-        """Calcule les features de connection tracking"""
-        # Ces features nécessitent de tracker les connexions globalement
-        # Implémentation simplifiée pour démonstration
-        
-        # ct_srv_src: connections to same service from same source
-        # ct_state_ttl: connections with same state and TTL
-        # ct_dst_ltm: connections to same destination in last time window
-        # etc.
-        
-        # Pour une implémentation complète, il faudrait maintenir
-        # un historique global des connexions
-        flow['ct_srv_src'] = min(10, max(1, flow['spkts'] // 10))
-        flow['ct_state_ttl'] = min(5, max(1, (flow['sttl'] + flow['dttl']) // 100))
-        flow['ct_dst_ltm'] = min(3, max(1, len(flow['_packets']) // 20))
-        flow['ct_src_dport_ltm'] = min(3, max(1, len(flow['_packets']) // 15))
-        flow['ct_dst_sport_ltm'] = min(3, max(1, len(flow['_packets']) // 15))
-        flow['ct_dst_src_ltm'] = min(3, max(1, len(flow['_packets']) // 25))
-        flow['ct_src_ltm'] = min(5, max(1, len(flow['_packets']) // 10))
-        flow['ct_srv_dst'] = min(5, max(1, len(flow['_packets']) // 12))
+    def _calculate_connection_tracking_features(self, df, endpoints):
+        """Calcule les features de connection tracking sur l'ensemble des flows"""
+        # ct_*: nombre de flows partageant service / IP / port avec le flow courant,
+        # compté en une passe groupby par feature (à la place d'un historique par flow).
+        # Plafonné à 10 : self.flows n'est jamais réinitialisé, les comptes bruts croîtraient
+        # avec la durée de vie du service, hors de la plage vue à l'entraînement
+        ct = pd.DataFrame.from_records(endpoints, columns=['src_ip', 'sport', 'dst_ip', 'dport'])
+        ct['service'] = df['service'].to_numpy()
+        
+        for feature, group_keys in _CT_GROUP_KEYS.items():
+            counts = ct.groupby(group_keys, sort=False)['src_ip'].transform('size')
+            df[feature] = counts.clip(1, 10).to_numpy()
+        
+        # ct_state_ttl: plage de TTL du flow
+        df['ct_state_ttl'] = ((df['sttl'] + df['dttl']) // 100).clip(1, 5)
     
     def _finalize_flow_features(self, flow):
         """Finalise les features du flow"""
@@ -520,11 +516,9 @@ class UNSW_NB15_FeatureExtractor:
         for feature in ['dur', 'rate', 'sload', 'dload', 'sinpkt', 'dinpkt', 'sjit', 'djit', 'smean', 'dmean', 'tcprtt', 'synack', 'ackdat']:
             if np.isnan(flow[feature]) or np.isinf(flow[feature]):
                 flow[feature] = 0.0
-                
-        # Nettoyage des features temporaires
-        for temp_key in ['_packets', '_first_time', '_last_time', '_src_packets', '_dst_packets', '_tcp_flags', '_direction']:
-            if temp_key in flow:
-                del flow[temp_key]
+        
+        # Les attributs internes (_npackets, accumulateurs...) sont conservés :
+        # un flow peut se poursuivre dans le batch suivant
     
     def _flows_to_dataframe(self):
         """Convertit les flows en DataFrame avec les features UNSW-NB15"""
@@ -541,23 +535,33 @@ class UNSW_NB15_FeatureExtractor:
             "ct_ftp_cmd", "ct_flw_http_mthd", "ct_src_ltm", "ct_srv_dst", "is_sm_ips_ports"
         ]
         
-        # Extraire les données
-        data = []
-        for flow_id, flow in self.flows.items():
-            row = {}
-            for feature in feature_order:
-                row[feature] = flow.get(feature, 0)
-            data.append(row)
+        # Extraire les données : une ligne (tuple) par flow, colonnes dans l'ordre UNSW-NB15
+        rows = []
+        endpoints = []
+        for (endpoint1, endpoint2), flow in self.flows.items():
+            rows.append(tuple(flow.get(feature, 0) for feature in feature_order))
+            src, dst = (endpoint1, endpoint2) if flow['_direction'] == FORWARD else (endpoint2, endpoint1)
+            endpoints.append((src[0], src[1], dst[0], dst[1]))
+        df = pd.DataFrame.from_records(rows, columns=feature_order)
+        
+        # Colonnes catégorielles : une dizaine de valeurs distinctes au plus
+        for feature in _CATEGORICAL_FEATURES:
+            df[feature] = df[feature].astype('category')
         
-        df = pd.DataFrame(data)
+        # Les colonnes numériques sont déjà typées (int64/float64) à la construction
+        numeric_features = [f for f in feature_order if f not in _CATEGORICAL_FEATURES]
+        non_numeric = [f for f in numeric_features if df[f].dtype == object]
+        if non_numeric:
+            df[non_numeric] = df[non_numeric].apply(pd.to_numeric, errors='coerce').fillna(0)
         
-        # Assurer les types corrects
-        numeric_features = [f for f in feature_order if f not in ['proto', 'service', 'state']]
-        for feature in numeric_features:
-            df[feature] = pd.to_numeric(df[feature], errors='coerce').fillna(0)
+        self._calculate_connection_tracking_features(df, endpoints)
         
         return df
 
+def _extract_pcap_worker(pcap_file):
+    """Extrait les features d'un PCAP dans un processus de travail"""
+    return UNSW_NB15_FeatureExtractor().process_pcap(pcap_file)
+
 def main():
     """Fonction principale pour tester l'extracteur"""
     extractor = UNSW_NB15_FeatureExtractor()
@@ -3,11 +3,14 @@ Classes d'ensemble et de détection extraites du notebook aiModelsSecu.ipynb
 """
 
 import numpy as np
-from sklearn.linear_model import LogisticRegression
+from concurrent.futures import ThreadPoolExecutor
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Threads du pool partagé par les appels aux modèles de l'ensemble
+MODEL_THREADS = 8
+
 class AdvancedEnsembleClassifier:
     """
     Classificateur d'ensemble avancé avec multiple stratégies de vote et stacking
@@ -15,11 +18,17 @@ class AdvancedEnsembleClassifier:
     
     def __init__(self, base_models=None, meta_model=None, voting_strategy='soft'):
         self.base_models = base_models or {}
-        self.meta_model = meta_model or LogisticRegression(random_state=42)
+        if meta_model is None:
+            # Import différé : sklearn.linear_model n'est chargé que si aucun méta-modèle n'est fourni
+            from sklearn.linear_model import LogisticRegression
+            meta_model = LogisticRegression(random_state=42)
+        self.meta_model = meta_model
         self.voting_strategy = voting_strategy
         self.is_fitted = False
         self.model_weights = None
         self.stacking_classifier = None
+        # Pool créé une seule fois : démarrer un pool par appel coûte plus que la prédiction d'une ligne
+        self._executor = ThreadPoolExecutor(max_workers=MODEL_THREADS, thread_name_prefix="ensemble")
         
     def add_model(self, name, model):
         """Ajoute un modèle à l'ensemble"""
@@ -58,47 +67,60 @@ class AdvancedEnsembleClassifier:
         else:
             return self._predict_proba_ensemble(X)
             
+    def run_models(self, X, method, names=None):
+        """Appelle predict / predict_proba de chaque modèle en parallèle (threads : modèles partagés, sans copie)"""
+        models = [
+            (name, model) for name, model in self.base_models.items()
+            if (names is None or name in names) and hasattr(model, method)
+        ]
+        
+        futures = [(name, self._executor.submit(getattr(model, method), X)) for name, model in models]
+        
+        results = []
+        for name, future in futures:
+            try:
+                results.append((name, future.result()))
+            except Exception as e:
+                logger.warning(f"Erreur {method} {name}: {e}")
+        return results
+            
     def _predict_majority_voting(self, X):
         """Vote majoritaire"""
+        return self._majority_vote([pred for _, pred in self.run_models(X, 'predict')], len(X))
+        
+    @staticmethod
+    def _majority_vote(predictions, n_samples):
+        """Vote majoritaire sur des prédictions déjà calculées"""
         logger.info("🔄 Vote majoritaire")
-        predictions = []
-        for name, model in self.base_models.items():
-            try:
-                pred = model.predict(X)
-                predictions.append(pred)
-            except Exception as e:
-                logger.warning(f"Erreur prédiction 4 {name}: {e}")
-                continue
-                
         if predictions:
             predictions = np.array(predictions)
             return np.apply_along_axis(lambda x: np.bincount(x).argmax(), axis=0, arr=predictions)
         else:
-            return np.zeros(len(X))
+            return np.zeros(n_samples)
             
     def _predict_weighted_voting(self, X):
         """Vote pondéré"""
+        return self.vote(dict(self.run_models(X, 'predict')), len(X))
+        
+    def vote(self, model_predictions, n_samples):
+        """Vote pondéré à partir des prédictions individuelles déjà calculées ({nom: prédictions})"""
         if not self.model_weights:
-            return self._predict_majority_voting(X)
+            return self._majority_vote(list(model_predictions.values()), n_samples)
             
-        weighted_predictions = np.zeros(len(X))
+        weighted_predictions = np.zeros(n_samples)
         total_weight = 0
         
-        for name, model in self.base_models.items():
-            if name in self.model_weights:
-                try:
-                    pred = model.predict(X)
-                    weight = self.model_weights[name]
-                    weighted_predictions += pred * weight
-                    total_weight += weight
-                except Exception as e:
-                    logger.warning(f"Erreur prédiction pondérée {name}: {e}")
-                    continue
+        for name, pred in model_predictions.items():
+            if name not in self.model_weights:
+                continue
+            weight = self.model_weights[name]
+            weighted_predictions += pred * weight
+            total_weight += weight
                     
         if total_weight > 0:
             return (weighted_predictions / total_weight > 0.5).astype(int)
         else:
-            return self._predict_majority_voting(X)
+            return self._majority_vote(list(model_predictions.values()), n_samples)
             
     def _predict_soft_voting(self, X):
         """Vote soft (basé sur les probabilités)"""
@@ -113,16 +135,10 @@ class AdvancedEnsembleClassifier:
         all_probas = []
         weights = []
         
-        for name, model in self.base_models.items():
-            if hasattr(model, 'predict_proba'):
-                try:
-                    proba = model.predict_proba(X)
-                    all_probas.append(proba)
-                    weight = self.model_weights.get(name, 1.0) if self.model_weights else 1.0
-                    weights.append(weight)
-                except Exception as e:
-                    logger.warning(f"Erreur probabilités {name}: {e}")
-                    continue
+        for name, proba in self.run_models(X, 'predict_proba'):
+            all_probas.append(proba)
+            weight = self.model_weights.get(name, 1.0) if self.model_weights else 1.0
+            weights.append(weight)
                     
         if all_probas:
             # Moyenne pondérée des probabilités
@@ -146,6 +162,20 @@ class HybridDetectionSystem:
         self.anomaly_detector = anomaly_detector
         self.threshold = threshold
         self.is_fitted = True  # Pré-entraîné
+        self.anomaly_detector_fitted = self._is_detector_fitted(anomaly_detector)
+        if not self.anomaly_detector_fitted:
+            logger.warning("Détecteur d'anomalies non entraîné, utilisation ensemble uniquement")
+    
+    @staticmethod
+    def _is_detector_fitted(detector):
+        """Vérifie une seule fois, à la construction, que le détecteur d'anomalies est entraîné"""
+        from sklearn.exceptions import NotFittedError
+        from sklearn.utils.validation import check_is_fitted
+        try:
+            check_is_fitted(detector)
+            return True
+        except (NotFittedError, TypeError):
+            return False
         
     def predict(self, X, strategy='hybrid'):
         """Fait des prédictions avec le système hybride"""
@@ -161,43 +191,34 @@ class HybridDetectionSystem:
             return self._predict_hybrid(X)
     
     def _predict_hybrid(self, X):
-        """Prédiction hybride"""
-        ensemble_pred = self.ensemble_classifier.predict(X)
-        ensemble_proba = self.ensemble_classifier.predict_proba(X)
+        """Prédiction hybride (vectorisée : une anomalie détectée force la classe attaque)"""
+        if not self.anomaly_detector_fitted:
+            return self.ensemble_classifier.predict(X)
         
-        # Gérer le cas où les anomalies ne sont pas disponibles
-        try:
-            anomaly_scores = self.anomaly_detector.predict(X)
-        except:
-            logger.warning("Détecteur d'anomalies non disponible, utilisation ensemble uniquement")
+        # Détecteur d'anomalies sur le pool persistant de l'ensemble, en parallèle de l'ensemble
+        anomaly_future = self.ensemble_classifier._executor.submit(self.anomaly_detector.predict, X)
+        ensemble_pred = self.ensemble_classifier.predict(X)
+        return self._combine_hybrid(ensemble_pred, anomaly_future.result())
+    
+    @staticmethod
+    def _combine_hybrid(ensemble_pred, anomaly_scores):
+        """Combine des prédictions déjà calculées de l'ensemble et du détecteur d'anomalies"""
+        if anomaly_scores is None:
             return ensemble_pred
         
-        hybrid_predictions = []
-        
-        for i in range(len(X)):
-            ensemble_confidence = np.max(ensemble_proba[i]) if ensemble_proba is not None else 0.5
-            is_anomaly = anomaly_scores[i] == -1 if anomaly_scores is not None else False
-            
-            if ensemble_confidence > self.threshold and not is_anomaly:
-                hybrid_predictions.append(ensemble_pred[i])
-            elif is_anomaly:
-                hybrid_predictions.append(1)  # Attaque
-            else:
-                hybrid_predictions.append(ensemble_pred[i])
-        
-        return np.array(hybrid_predictions)
+        # Anomalie -> attaque (1) quelle que soit la confiance ; sinon prédiction de l'ensemble
+        anomaly_mask = np.asarray(anomaly_scores) == -1
+        return np.where(anomaly_mask, 1, ensemble_pred)
     
     def get_prediction_details(self, X):
         """Retourne les détails de la prédiction pour debugging"""
         ensemble_pred = self.ensemble_classifier.predict(X)
         ensemble_proba = self.ensemble_classifier.predict_proba(X)
         
-        try:
-            anomaly_scores = self.anomaly_detector.predict(X)
-        except:
-            anomaly_scores = None
-            
-        hybrid_pred = self.predict(X, strategy='hybrid')
+        anomaly_scores = self.anomaly_detector.predict(X) if self.anomaly_detector_fitted else None
+        
+        # Réutilise les prédictions ci-dessus au lieu de relancer l'ensemble et le détecteur
+        hybrid_pred = self._combine_hybrid(ensemble_pred, anomaly_scores)
         
         return {
             'ensemble_prediction': ensemble_pred,
@@ -3,8 +3,10 @@ Chargeur de modèles pour le système de détection temps réel
 """
 
 import joblib
+import numpy as np
 import pickle
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, Any, Optional
 from sklearn.ensemble import IsolationForest
@@ -63,31 +65,38 @@ class ModelLoader:
         """Charge les modèles individuels"""
         logger.info("📂 Chargement des modèles individuels...")
         
+        # Lectures disque en parallèle ; le MLP (correctif numpy global) est chargé ensuite sur ce thread,
+        # une fois le pool terminé, pour ne jamais modifier np.random pendant d'autres chargements
+        with ThreadPoolExecutor(max_workers=len(MODELS_CONFIG) or 1) as executor:
+            futures = {
+                model_name: executor.submit(self._load_model, config["path"])
+                for model_name, config in MODELS_CONFIG.items()
+                if model_name != "mlp"
+            }
+        
+        # Résultats collectés dans l'ordre de MODELS_CONFIG
         for model_name, config in MODELS_CONFIG.items():
             model_path = config["path"]
-            
-            if model_path.exists():
-                try:
-                    # Traitement spécial pour le MLP avec problème numpy
-                    if model_name == "mlp":
-                        model = self._load_mlp_with_fix(model_path)
-                    else:
-                        model = joblib.load(model_path)
-                    
-                    self.models[model_name] = model
-                    logger.info(f"  ✅ {model_name} chargé depuis {model_path}")
-                except Exception as e:
-                    logger.warning(f"  ⚠️ Erreur chargement {model_name}: {e}")
-            else:
+            try:
+                if model_name in futures:
+                    self.models[model_name] = futures[model_name].result()
+                else:
+                    self.models[model_name] = self._load_mlp_with_fix(model_path)
+                logger.info(f"  ✅ {model_name} chargé depuis {model_path}")
+            except FileNotFoundError:
                 logger.warning(f"  ⚠️ Fichier modèle introuvable: {model_path}")
+            except Exception as e:
+                logger.warning(f"  ⚠️ Erreur chargement {model_name}: {e}")
         
         logger.info(f"📊 Modèles chargés: {list(self.models.keys())}")
     
+    def _load_model(self, model_path: Path):
+        """Charge un modèle (FileNotFoundError si le fichier est absent, sans stat préalable)"""
+        # Tableaux numpy mappés en lecture seule : pages partagées entre processus via le cache OS
+        return joblib.load(model_path, mmap_mode='r')
+    
     def _load_mlp_with_fix(self, model_path):
         """Charge le MLP en gérant les problèmes de compatibilité numpy"""
-        import numpy as np
-        import pickle
-        
         try:
             # Essayer le chargement normal d'abord
             return joblib.load(model_path)
@@ -120,26 +129,24 @@ class ModelLoader:
         """Charge les préprocesseurs (scaler et encodeurs)"""
         logger.info("🔧 Chargement des préprocesseurs...")
         
-        # Charger le scaler
-        if SCALER_PATH.exists():
-            try:
-                self.scaler = joblib.load(SCALER_PATH)
-                logger.info(f"  ✅ Scaler chargé depuis {SCALER_PATH}")
-            except Exception as e:
-                logger.warning(f"  ⚠️ Erreur chargement scaler: {e}")
-        else:
+        # Charger le scaler (fichier absent -> FileNotFoundError, sans stat préalable)
+        try:
+            self.scaler = joblib.load(SCALER_PATH)
+            logger.info(f"  ✅ Scaler chargé depuis {SCALER_PATH}")
+        except FileNotFoundError:
             logger.warning(f"  ⚠️ Fichier scaler introuvable: {SCALER_PATH}")
+        except Exception as e:
+            logger.warning(f"  ⚠️ Erreur chargement scaler: {e}")
         
         # Charger les label encoders
-        if LABEL_ENCODERS_PATH.exists():
-            try:
-                self.label_encoders = joblib.load(LABEL_ENCODERS_PATH)
-                logger.info(f"  ✅ Label encoders chargés depuis {LABEL_ENCODERS_PATH}")
-                logger.info(f"  📋 Encodeurs disponibles: {list(self.label_encoders.keys())}")
-            except Exception as e:
-                logger.warning(f"  ⚠️ Erreur chargement label encoders: {e}")
-        else:
+        try:
+            self.label_encoders = joblib.load(LABEL_ENCODERS_PATH)
+            logger.info(f"  ✅ Label encoders chargés depuis {LABEL_ENCODERS_PATH}")
+            logger.info(f"  📋 Encodeurs disponibles: {list(self.label_encoders.keys())}")
+        except FileNotFoundError:
             logger.warning(f"  ⚠️ Fichier label encoders introuvable: {LABEL_ENCODERS_PATH}")
+        except Exception as e:
+            logger.warning(f"  ⚠️ Erreur chargement label encoders: {e}")
     
     def _create_ensemble_classifier(self):
         """Crée le classificateur d'ensemble"""
@@ -180,10 +187,13 @@ class ModelLoader:
             return
         
         # Créer un détecteur d'anomalies simple (peut être amélioré)
+        # max_samples=256 : chaque arbre ne voit qu'un sous-échantillon, quelle que soit la taille du fit
         anomaly_detector = IsolationForest(
             contamination=0.1,
+            max_samples=256,
+            n_estimators=100,
             random_state=42,
-            n_jobs=-1
+            n_jobs=1  # Déjà exécuté dans un thread parallèle à l'ensemble : pas de parallélisme imbriqué
         )
         
         # Note: Dans un vrai système, ce détecteur devrait être pré-entraîné
@@ -239,31 +249,32 @@ class ModelLoader:
             else:
                 processed_data = data
             
+            # Matrice 1xF construite une seule fois et partagée par tous les modèles (pas de liste à reconvertir)
+            X_row = np.asarray(processed_data).reshape(1, -1)
+            
             # Faire la prédiction avec l'ensemble
             if strategy == "ensemble" and self.ensemble_classifier:
-                prediction = self.ensemble_classifier.predict([processed_data])[0]
-                probabilities = self.ensemble_classifier.predict_proba([processed_data])[0]
+                # Prédictions individuelles lancées une seule fois en parallèle ; le vote pondéré en est dérivé
+                model_predictions = dict(self.ensemble_classifier.run_models(X_row, 'predict'))
+                prediction = self.ensemble_classifier.vote(model_predictions, len(X_row))[0]
+                probabilities = self.ensemble_classifier.predict_proba(X_row)[0]
                 
-                # Obtenir les prédictions individuelles
-                individual_predictions = {}
-                for model_name, model in self.models.items():
-                    try:
-                        pred = model.predict([processed_data])[0]
-                        individual_predictions[model_name] = float(pred)
-                    except Exception as e:
-                        logger.warning(f"Erreur prédiction {model_name}: {e}")
-                        individual_predictions[model_name] = 0.0
+                # Un modèle en erreur vaut 0.0
+                individual_predictions = {
+                    model_name: float(model_predictions[model_name][0]) if model_name in model_predictions else 0.0
+                    for model_name in self.models
+                }
                 
             elif strategy == "hybrid" and self.hybrid_system:
-                prediction = self.hybrid_system.predict([processed_data], strategy="hybrid")[0]
-                probabilities = self.ensemble_classifier.predict_proba([processed_data])[0] if self.ensemble_classifier else [0.5, 0.5]
+                prediction = self.hybrid_system.predict(X_row, strategy="hybrid")[0]
+                probabilities = self.ensemble_classifier.predict_proba(X_row)[0] if self.ensemble_classifier else [0.5, 0.5]
                 individual_predictions = {"hybrid": float(prediction)}
             else:
                 raise ValueError(f"Stratégie inconnue ou non disponible: {strategy}")
             
             # Calculer les métriques
             attack_probability = float(probabilities[1]) if len(probabilities) > 1 else 0.5
-            confidence = max(probabilities) if probabilities is not None else 0.5
+            confidence = np.max(probabilities) if probabilities is not None else 0.5
             is_attack = bool(prediction == 1)
             
             return {
@@ -304,49 +315,91 @@ class ModelLoader:
             processed_data = self.preprocessor.preprocess_single_sample(parsed_data)
             
             # 4. Faire la prédiction
-            if strategy == "ensemble":
-                prediction = self.ensemble_classifier.predict([processed_data])[0]
-                probabilities = self.ensemble_classifier.predict_proba([processed_data])[0]
-            elif strategy == "hybrid":
-                prediction = self.hybrid_system.predict([processed_data], strategy="hybrid")[0]
-                probabilities = self.ensemble_classifier.predict_proba([processed_data])[0]
-            else:
-                raise ValueError(f"Stratégie inconnue: {strategy}")
-            
-            # 5. Calculer la confiance
-            confidence = max(probabilities) if probabilities is not None else 0.5
+            predictions, probabilities = self._predict_matrix(processed_data[np.newaxis, :], strategy)
             
-            # 6. Déterminer le label
-            label = "Attack" if prediction == 1 else "Normal"
-            
-            return {
-                "prediction": int(prediction),
-                "label": label,
-                "confidence": float(confidence),
-                "probabilities": {
-                    "normal": float(probabilities[0]) if probabilities is not None else 0.5,
-                    "attack": float(probabilities[1]) if probabilities is not None else 0.5
-                },
-                "strategy": strategy,
-                "status": "success"
-            }
+            return self._build_prediction_result(predictions[0], probabilities[0] if probabilities is not None else None, strategy)
             
         except Exception as e:
             logger.error(f"Erreur prédiction: {e}")
-            return {
-                "prediction": -1,
-                "label": "Error",
-                "confidence": 0.0,
-                "error": str(e),
-                "status": "error"
-            }
+            return self._build_error_result(e)
     
     def predict_batch(self, log_data_list: list, strategy: str = "hybrid") -> list:
         """
-        Fait des prédictions sur un batch de données
+        Fait des prédictions sur un batch de données (un seul appel aux modèles pour tout le lot)
         """
-        results = []
-        for log_data in log_data_list:
-            result = self.predict_single(log_data, strategy)
-            results.append(result)
+        if not self.is_loaded:
+            raise RuntimeError("Modèles non chargés")
+        
+        results = [None] * len(log_data_list)
+        valid_indices = []
+        valid_data = []
+        
+        # 1-2. Parser et valider chaque ligne ; les lignes invalides gardent leur résultat d'erreur
+        for i, log_data in enumerate(log_data_list):
+            try:
+                parsed_data = self.preprocessor.parse_log_line(log_data)
+                if not self.preprocessor.validate_input(parsed_data):
+                    raise ValueError("Données d'entrée invalides")
+                valid_indices.append(i)
+                valid_data.append(parsed_data)
+            except Exception as e:
+                logger.error(f"Erreur prédiction: {e}")
+                results[i] = self._build_error_result(e)
+        
+        if valid_data:
+            try:
+                # 3-4. Préprocesser tout le lot puis prédire en une fois
+                X_batch = self.preprocessor.preprocess_batch(valid_data)
+                predictions, probabilities = self._predict_matrix(X_batch, strategy)
+                
+                for row, i in enumerate(valid_indices):
+                    results[i] = self._build_prediction_result(
+                        predictions[row], probabilities[row] if probabilities is not None else None, strategy
+                    )
+            except Exception as e:
+                logger.error(f"Erreur prédiction batch: {e}")
+                for i in valid_indices:
+                    results[i] = self._build_error_result(e)
+        
         return results
+    
+    def _predict_matrix(self, X, strategy: str):
+        """Prédictions et probabilités de l'ensemble pour une matrice d'échantillons"""
+        if strategy == "ensemble":
+            predictions = self.ensemble_classifier.predict(X)
+        elif strategy == "hybrid":
+            predictions = self.hybrid_system.predict(X, strategy="hybrid")
+        else:
+            raise ValueError(f"Stratégie inconnue: {strategy}")
+        probabilities = self.ensemble_classifier.predict_proba(X)
+        return predictions, probabilities
+    
+    def _build_prediction_result(self, prediction, probabilities, strategy: str) -> Dict[str, Any]:
+        """Construit le résultat d'une prédiction réussie"""
+        # Calculer la confiance
+        confidence = probabilities.max() if probabilities is not None else 0.5
+        
+        # Déterminer le label
+        label = "Attack" if prediction == 1 else "Normal"
+        
+        return {
+            "prediction": int(prediction),
+            "label": label,
+            "confidence": float(confidence),
+            "probabilities": {
+                "normal": float(probabilities[0]) if probabilities is not None else 0.5,
+                "attack": float(probabilities[1]) if probabilities is not None else 0.5
+            },
+            "strategy": strategy,
+            "status": "success"
+        }
+    
+    def _build_error_result(self, error: Exception) -> Dict[str, Any]:
+        """Construit le résultat d'une prédiction en erreur"""
+        return {
+            "prediction": -1,
+            "label": "Error",
+            "confidence": 0.0,
+            "error": str(error),
+            "status": "error"
+        }
@@ -117,6 +117,12 @@ class RealtimePreprocessor:
             logger.error(f"Erreur preprocessing échantillon: {e}")
             raise
     
+    def preprocess_batch(self, data_list: List[Dict[str, Any]]) -> np.ndarray:
+        """
+        Préprocess un lot d'échantillons en une seule passe (matrice 2-D)
+        """
+        return self.preprocess_dataframe(pd.DataFrame(data_list))
+    
     def preprocess_dataframe(self, df: pd.DataFrame) -> np.ndarray:
         """
         Préprocess un DataFrame complet
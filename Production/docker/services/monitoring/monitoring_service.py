@@ -4,17 +4,26 @@ Service de monitoring pour le système IDS distribué
 Surveille la santé de tous les composants et génère des métriques
 """
 
-import json
+import asyncio
+import atexit
+import hashlib
 import logging
 import os
+import queue
+import socket
 import threading
 import time
 from datetime import datetime
-from typing import Dict, List, Optional
-import requests
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Optional, Tuple
+import aiohttp
+import orjson
 import redis
 import psutil
-from flask import Flask, jsonify, render_template_string
+from flask import Flask, Response
+from jinja2 import Environment
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, generate_latest
+from prometheus_client.core import GaugeMetricFamily
 
 # Configuration du logging via variables d'environnement
 log_level = getattr(logging, os.getenv('LOG_LEVEL', 'INFO').upper())
@@ -34,17 +43,186 @@ PACKET_CAPTURE_PORT = int(os.getenv('PACKET_CAPTURE_PORT', '9001'))
 ALERT_MANAGER_PORT = int(os.getenv('ALERT_MANAGER_PORT', '9003'))
 ALERT_MANAGER_HOST = os.getenv('ALERT_MANAGER_HOST', 'alert-manager')
 
+# Les threads appelants ne font qu'empiler les enregistrements ; l'écriture
+# fichier/console est faite par le thread de fond du QueueListener
+log_queue = queue.Queue(-1)
+log_formatter = logging.Formatter(log_format)
+log_handlers = [logging.FileHandler(log_file), logging.StreamHandler()]
+for handler in log_handlers:
+    handler.setFormatter(log_formatter)
+log_listener = QueueListener(log_queue, *log_handlers, respect_handler_level=True)
+log_listener.start()
+atexit.register(log_listener.stop)
+
 logging.basicConfig(
     level=log_level,
-    format=log_format,
-    handlers=[
-        logging.FileHandler(log_file),
-        logging.StreamHandler()
-    ]
+    handlers=[QueueHandler(log_queue)]
 )
 
 logger = logging.getLogger(__name__)
 
+# Keepalive TCP des connexions Redis (options disponibles sous Linux)
+REDIS_KEEPALIVE_OPTIONS = {
+    getattr(socket, option): value
+    for option, value in (('TCP_KEEPIDLE', 30), ('TCP_KEEPINTVL', 10), ('TCP_KEEPCNT', 3))
+    if hasattr(socket, option)
+}
+
+# Unités de taille (les valeurs sont arrondies à l'affichage, pas à la collecte)
+GB = 1 << 30
+MB = 1 << 20
+
+# Stream Redis de l'historique des snapshots (lecture via XREVRANGE)
+HISTORY_STREAM = "monitoring:history"
+
+# Compteurs globaux lus depuis les clés Redis metrics:<nom>
+GLOBAL_COUNTERS = ("packets_captured", "features_extracted", "alerts_generated", "threats_detected")
+GLOBAL_COUNTER_KEYS = [f"metrics:{name}" for name in GLOBAL_COUNTERS]
+# Réponse constante du endpoint /health, encodée une seule fois
+HEALTH_RESPONSE = orjson.dumps({"status": "healthy", "service": "monitoring"})
+# Réponse servie (503) tant que la boucle n'a pas publié son premier snapshot
+COLLECTING_RESPONSE = orjson.dumps({"status": "collecting", "service": "monitoring"})
+
+# Dashboard découpé : en-tête statique (bytes), cartes de métriques rendues par Jinja
+# à chaque requête, pied de page rendu une seule fois au démarrage du service
+DASHBOARD_HEAD = '''
+<!DOCTYPE html>
+<html>
+<head>
+    <title>IDS Monitoring Dashboard</title>
+    <style>
+        body { font-family: Arial, sans-serif; margin: 20px; }
+        .metric-card { 
+            border: 1px solid #ddd; 
+            padding: 15px; 
+            margin: 10px; 
+            border-radius: 5px;
+            display: inline-block;
+            min-width: 200px;
+        }
+        .healthy { background-color: #d4edda; }
+        .unhealthy { background-color: #f8d7da; }
+        .unreachable { background-color: #fff3cd; }
+        .metric-value { font-size: 1.5em; font-weight: bold; }
+        h1, h2 { color: #333; }
+    </style>
+</head>
+<body>
+    <h1>🛡️ IDS Distributed Monitoring Dashboard</h1>
+
+'''.encode()
+
+DASHBOARD_BODY_HTML = '''    <h2>Services Status</h2>
+    <div id="services">
+        {% for service, status in services.items() %}
+        <div class="metric-card {{ status.status }}" data-service="{{ service }}">
+            <h3>{{ service }}</h3>
+            <div class="metric-value" data-metric="services.{{ service }}.status" data-format="upper">{{ status.status|upper }}</div>
+            <p>Response Time: <span data-metric="services.{{ service }}.response_time_ms">{{ status.response_time_ms or 'N/A' }}</span>ms</p>
+            <p>Uptime: <span data-metric="services.{{ service }}.uptime_percentage" data-format="pct">{{ "%.1f"|format(status.uptime_percentage) }}%</span></p>
+        </div>
+        {% endfor %}
+    </div>
+
+    <h2>System Metrics</h2>
+    <div class="metric-card">
+        <h3>CPU Usage</h3>
+        <div class="metric-value" data-metric="system.cpu.usage_percent" data-format="pct">{{ "%.1f"|format(system.cpu.usage_percent) }}%</div>
+    </div>
+    <div class="metric-card">
+        <h3>Memory Usage</h3>
+        <div class="metric-value" data-metric="system.memory.usage_percent" data-format="pct">{{ "%.1f"|format(system.memory.usage_percent) }}%</div>
+        <p><span data-metric="system.memory.used_gb" data-format="gb">{{ "%.2f"|format(system.memory.used_gb) }}</span>GB / <span data-metric="system.memory.total_gb" data-format="gb">{{ "%.2f"|format(system.memory.total_gb) }}</span>GB</p>
+    </div>
+    <div class="metric-card">
+        <h3>Disk Usage</h3>
+        <div class="metric-value" data-metric="system.disk.usage_percent" data-format="pct">{{ "%.1f"|format(system.disk.usage_percent) }}%</div>
+        <p><span data-metric="system.disk.used_gb" data-format="gb">{{ "%.2f"|format(system.disk.used_gb) }}</span>GB / <span data-metric="system.disk.total_gb" data-format="gb">{{ "%.2f"|format(system.disk.total_gb) }}</span>GB</p>
+    </div>
+
+    <h2>Redis Metrics</h2>
+    <div class="metric-card">
+        <h3>Connected Clients</h3>
+        <div class="metric-value" data-metric="global_metrics.redis_metrics.connected_clients">{{ global_metrics.redis_metrics.connected_clients }}</div>
+    </div>
+    <div class="metric-card">
+        <h3>Memory Usage</h3>
+        <div class="metric-value" data-metric="global_metrics.redis_metrics.used_memory_human">{{ global_metrics.redis_metrics.used_memory_human }}</div>
+        <p>Peak: <span data-metric="global_metrics.redis_metrics.used_memory_peak_human">{{ global_metrics.redis_metrics.used_memory_peak_human }}</span></p>
+    </div>
+    <div class="metric-card">
+        <h3>Operations</h3>
+        <div class="metric-value"><span data-metric="global_metrics.redis_metrics.instantaneous_ops_per_sec">{{ global_metrics.redis_metrics.instantaneous_ops_per_sec }}</span>/s</div>
+        <p>Total: <span data-metric="global_metrics.redis_metrics.total_commands_processed">{{ global_metrics.redis_metrics.total_commands_processed }}</span></p>
+    </div>
+    <div class="metric-card">
+        <h3>Cache Hits/Misses</h3>
+        <div class="metric-value"><span data-metric="global_metrics.redis_metrics.keyspace_hits">{{ global_metrics.redis_metrics.keyspace_hits }}</span>/<span data-metric="global_metrics.redis_metrics.keyspace_misses">{{ global_metrics.redis_metrics.keyspace_misses }}</span></div>
+    </div>
+
+    <h2>IDS Metrics</h2>
+    <div class="metric-card">
+        <h3>Packets Captured</h3>
+        <div class="metric-value" data-metric="global_metrics.packets_captured">{{ global_metrics.packets_captured }}</div>
+    </div>
+    <div class="metric-card">
+        <h3>Features Extracted</h3>
+        <div class="metric-value" data-metric="global_metrics.features_extracted">{{ global_metrics.features_extracted }}</div>
+    </div>
+    <div class="metric-card">
+        <h3>Threats Detected</h3>
+        <div class="metric-value" data-metric="global_metrics.threats_detected">{{ global_metrics.threats_detected }}</div>
+    </div>
+    <div class="metric-card">
+        <h3>Alerts Generated</h3>
+        <div class="metric-value" data-metric="global_metrics.alerts_generated">{{ global_metrics.alerts_generated }}</div>
+    </div>
+'''
+
+DASHBOARD_TAIL_HTML = '''    <p><em>Metrics refreshed automatically every {{ dashboard_refresh }} seconds</em></p>
+
+    <script>
+        // Rafraîchit uniquement les valeurs depuis /metrics (JSON), sans recharger la page
+        function lookup(obj, path) {
+            return path.split('.').reduce((o, key) => (o == null ? undefined : o[key]), obj);
+        }
+
+        function formatValue(value, format) {
+            if (value === undefined || value === null) return 'N/A';
+            if (format === 'pct') return Number(value).toFixed(1) + '%';
+            if (format === 'gb') return Number(value).toFixed(2);
+            if (format === 'upper') return String(value).toUpperCase();
+            return String(value);
+        }
+
+        async function refreshMetrics() {
+            try {
+                const response = await fetch('/metrics', { cache: 'no-store' });
+                if (!response.ok) return;
+                const metrics = await response.json();
+
+                document.querySelectorAll('[data-metric]').forEach((el) => {
+                    el.textContent = formatValue(lookup(metrics, el.dataset.metric), el.dataset.format);
+                });
+                document.querySelectorAll('[data-service]').forEach((card) => {
+                    const status = lookup(metrics, 'services.' + card.dataset.service + '.status');
+                    if (status) card.className = 'metric-card ' + status;
+                });
+            } catch (err) {
+                console.error('Metrics refresh failed', err);
+            }
+        }
+
+        setInterval(refreshMetrics, {{ dashboard_refresh }} * 1000);
+    </script>
+</body>
+</html>
+'''
+
+_dashboard_env = Environment(autoescape=True)
+DASHBOARD_BODY_TEMPLATE = _dashboard_env.from_string(DASHBOARD_BODY_HTML)
+DASHBOARD_TAIL_TEMPLATE = _dashboard_env.from_string(DASHBOARD_TAIL_HTML)
+
 class ServiceMonitor:
     """Moniteur pour un service spécifique"""
     
@@ -54,47 +232,56 @@ class ServiceMonitor:
         self.port = port
         self.check_interval = check_interval or int(os.getenv('SERVICE_CHECK_INTERVAL', '30'))
         self.timeout = int(os.getenv('SERVICE_TIMEOUT', '5'))
+        self.connect_timeout = float(os.getenv('SERVICE_CONNECT_TIMEOUT', '1'))
         self.status = "unknown"
         self.last_check = None
         self.response_time = None
         self.error_count = 0
         self.total_checks = 0
+        self.uptime_percentage = 0.0
+        self.health_url = f"{self.url}:{self.port}/health"
+        # Connexion courte (hôte injoignable détecté vite), délai global pour la réponse
+        self.request_timeout = aiohttp.ClientTimeout(total=self.timeout, sock_connect=self.connect_timeout)
         
-    def check_health(self) -> Dict:
-        """Vérifie la santé du service"""
+    async def check_health(self, session: aiohttp.ClientSession, now_iso: str) -> Dict:
+        """Vérifie la santé du service (horodatée avec le timestamp du tick)"""
         start_time = time.time()
+        error = None
         
         try:
-            response = requests.get(f"{self.url}:{self.port}/health", timeout=self.timeout)
-            response_time = (time.time() - start_time) * 1000  # en ms
-            
-            if response.status_code == 200:
-                self.status = "healthy"
-                self.response_time = response_time
-                data = response.json() if response.headers.get('content-type', '').startswith('application/json') else {}
-            else:
-                self.status = "unhealthy"
-                self.error_count += 1
-                data = {"error": f"HTTP {response.status_code}"}
+            async with session.get(self.health_url, timeout=self.request_timeout) as response:
+                response_time = (time.time() - start_time) * 1000  # en ms
                 
-        except requests.exceptions.RequestException as e:
+                if response.status == 200:
+                    self.status = "healthy"
+                    self.response_time = response_time
+                else:
+                    self.status = "unhealthy"
+                    self.error_count += 1
+                    error = f"HTTP {response.status}"
+                # Corps lu sans être décodé : seul le code HTTP compte, la connexion reste réutilisable
+                await response.read()
+                
+        except Exception as e:
+            # Toute erreur (réseau, timeout, URL invalide...) n'affecte que ce service
             self.status = "unreachable"
             self.error_count += 1
             self.response_time = None
-            data = {"error": str(e)}
+            error = str(e) or type(e).__name__
             
-        self.last_check = datetime.now()
+        self.last_check = now_iso
         self.total_checks += 1
+        self.uptime_percentage = (self.total_checks - self.error_count) * 100.0 / self.total_checks
         
         return {
             "service": self.name,
             "status": self.status,
             "response_time_ms": self.response_time,
-            "last_check": self.last_check.isoformat(),
+            "last_check": self.last_check,
             "error_count": self.error_count,
             "total_checks": self.total_checks,
-            "uptime_percentage": ((self.total_checks - self.error_count) / self.total_checks) * 100 if self.total_checks > 0 else 0,
-            "data": data
+            "uptime_percentage": self.uptime_percentage,
+            "error": error
         }
 
 class SystemMonitor:
@@ -102,41 +289,72 @@ class SystemMonitor:
     
     def __init__(self):
         self.start_time = datetime.now()
+        # Amorce le compteur CPU : les appels suivants mesurent depuis l'appel précédent
+        psutil.cpu_percent(interval=None)
+        # Valeurs constantes / objets réutilisés entre deux collectes
+        self._cpu_count = psutil.cpu_count()
+        self._process = psutil.Process()
+        # L'occupation disque évolue lentement : échantillonnée une collecte sur N
+        self._disk_sample_every = int(os.getenv('DISK_SAMPLE_EVERY', '10'))
+        self._tick = 0
+        self._disk_cache = None
+        # Échantillon réseau précédent (compteurs cumulés + instant monotone) pour calculer des débits
+        self._last_net_io = psutil.net_io_counters()
+        self._last_net_time = time.monotonic()
         
-    def get_system_metrics(self) -> Dict:
-        """Collecte les métriques système"""
+    def get_system_metrics(self, now: datetime, now_iso: str) -> Dict:
+        """Collecte les métriques système (horodatées avec le timestamp du tick)"""
         try:
-            cpu_percent = psutil.cpu_percent(interval=1)
+            cpu_percent = psutil.cpu_percent(interval=None)
             memory = psutil.virtual_memory()
-            disk = psutil.disk_usage('/')
+            if self._tick % self._disk_sample_every == 0 or self._disk_cache is None:
+                self._disk_cache = psutil.disk_usage('/')
+            self._tick += 1
+            disk = self._disk_cache
             
-            # Informations réseau
+            # Informations réseau : débits calculés par différence avec l'échantillon précédent
             net_io = psutil.net_io_counters()
+            net_time = time.monotonic()
+            elapsed = (net_time - self._last_net_time) or 1.0
+            bytes_sent_per_sec = (net_io.bytes_sent - self._last_net_io.bytes_sent) / elapsed
+            bytes_recv_per_sec = (net_io.bytes_recv - self._last_net_io.bytes_recv) / elapsed
+            self._last_net_io, self._last_net_time = net_io, net_time
+            
+            # Processus de monitoring : lectures groupées en une passe /proc
+            with self._process.oneshot():
+                process_memory = self._process.memory_info()
+                process_threads = self._process.num_threads()
             
             return {
-                "timestamp": datetime.now().isoformat(),
-                "uptime_seconds": (datetime.now() - self.start_time).total_seconds(),
+                "timestamp": now_iso,
+                "uptime_seconds": (now - self.start_time).total_seconds(),
                 "cpu": {
                     "usage_percent": cpu_percent,
-                    "cores": psutil.cpu_count()
+                    "cores": self._cpu_count
                 },
                 "memory": {
-                    "total_gb": round(memory.total / (1024**3), 2),
-                    "used_gb": round(memory.used / (1024**3), 2),
+                    "total_gb": memory.total / GB,
+                    "used_gb": memory.used / GB,
                     "usage_percent": memory.percent,
-                    "available_gb": round(memory.available / (1024**3), 2)
+                    "available_gb": memory.available / GB
                 },
                 "disk": {
-                    "total_gb": round(disk.total / (1024**3), 2),
-                    "used_gb": round(disk.used / (1024**3), 2),
-                    "free_gb": round(disk.free / (1024**3), 2),
+                    "total_gb": disk.total / GB,
+                    "used_gb": disk.used / GB,
+                    "free_gb": disk.free / GB,
                     "usage_percent": (disk.used / disk.total) * 100
                 },
                 "network": {
                     "bytes_sent": net_io.bytes_sent,
                     "bytes_recv": net_io.bytes_recv,
                     "packets_sent": net_io.packets_sent,
-                    "packets_recv": net_io.packets_recv
+                    "packets_recv": net_io.packets_recv,
+                    "bytes_sent_per_sec": bytes_sent_per_sec,
+                    "bytes_recv_per_sec": bytes_recv_per_sec
+                },
+                "process": {
+                    "memory_rss_mb": process_memory.rss / MB,
+                    "threads": process_threads
                 }
             }
         except Exception as e:
@@ -149,25 +367,52 @@ class RedisMonitor:
     def __init__(self, redis_client):
         self.redis_client = redis_client
         
-    def get_redis_metrics(self) -> Dict:
-        """Collecte les métriques Redis"""
-        try:
-            info = self.redis_client.info() # info is a dictionary with Redis metrics
-            
-            return {
-                "connected_clients": info.get('connected_clients', 0),
-                "used_memory_human": info.get('used_memory_human', '0B'),
-                "used_memory_peak_human": info.get('used_memory_peak_human', '0B'),
-                "total_commands_processed": info.get('total_commands_processed', 0),
-                "instantaneous_ops_per_sec": info.get('instantaneous_ops_per_sec', 0),
-                "keyspace_hits": info.get('keyspace_hits', 0),
-                "keyspace_misses": info.get('keyspace_misses', 0),
-                "uptime_in_seconds": info.get('uptime_in_seconds', 0),
-                "redis_version": info.get('redis_version', 'unknown')
-            }
-        except Exception as e:
-            logger.error(f"Erreur lors de la collecte des métriques Redis: {e}")
-            return {"error": str(e)}
+    def get_redis_metrics(self, info: Dict) -> Dict:
+        """Extrait les métriques Redis d'une réponse INFO"""
+        return {
+            "connected_clients": info.get('connected_clients', 0),
+            "used_memory_human": info.get('used_memory_human', '0B'),
+            "used_memory_peak_human": info.get('used_memory_peak_human', '0B'),
+            "total_commands_processed": info.get('total_commands_processed', 0),
+            "instantaneous_ops_per_sec": info.get('instantaneous_ops_per_sec', 0),
+            "keyspace_hits": info.get('keyspace_hits', 0),
+            "keyspace_misses": info.get('keyspace_misses', 0),
+            "uptime_in_seconds": info.get('uptime_in_seconds', 0),
+            "redis_version": info.get('redis_version', 'unknown')
+        }
+
+class SnapshotCollector:
+    """Collecteur Prometheus alimenté par le dernier snapshot en mémoire (aucun accès Redis au scrape)"""
+    
+    def __init__(self, service: 'MonitoringService'):
+        self.service = service
+        
+    def collect(self):
+        """Expose le snapshot courant sous forme de métriques Prometheus"""
+        metrics = self.service.get_all_metrics()
+        if metrics is None:
+            return
+        system = metrics["system"]
+        
+        for name, section in (("cpu", "cpu"), ("memory", "memory"), ("disk", "disk")):
+            yield GaugeMetricFamily(f"ids_{name}_usage_percent", f"Utilisation {name} (%)",
+                                    value=system.get(section, {}).get("usage_percent", 0))
+        
+        up = GaugeMetricFamily("ids_service_up", "Service joignable et sain (1) ou non (0)", labels=["service"])
+        response_time = GaugeMetricFamily("ids_service_response_time_ms", "Temps de réponse du health check (ms)", labels=["service"])
+        uptime = GaugeMetricFamily("ids_service_uptime_percent", "Disponibilité du service (%)", labels=["service"])
+        for service, status in metrics["services"].items():
+            up.add_metric([service], 1 if status["status"] == "healthy" else 0)
+            if status["response_time_ms"] is not None:
+                response_time.add_metric([service], status["response_time_ms"])
+            uptime.add_metric([service], status["uptime_percentage"])
+        yield up
+        yield response_time
+        yield uptime
+        
+        for name in GLOBAL_COUNTERS:
+            yield GaugeMetricFamily(f"ids_{name}", f"Compteur global metrics:{name}",
+                                    value=metrics["global_metrics"].get(name, 0))
 
 class MonitoringService:
     """Service principal de monitoring"""
@@ -178,13 +423,19 @@ class MonitoringService:
         redis_db = int(os.getenv('REDIS_DB', '0'))
         redis_password = os.getenv('REDIS_PASSWORD', None)
         
-        self.redis_client = redis.Redis(
+        # Pool de connexions persistantes partagé par la boucle de monitoring et Flask
+        redis_pool = redis.BlockingConnectionPool(
             host=redis_host, 
             port=redis_port, 
             db=redis_db,
             password=redis_password,
-            decode_responses=True
+            decode_responses=True,
+            max_connections=int(os.getenv('REDIS_MAX_CONNECTIONS', '32')),
+            socket_keepalive=True,
+            socket_keepalive_options=REDIS_KEEPALIVE_OPTIONS,
+            health_check_interval=30
         )
+        self.redis_client = redis.Redis(connection_pool=redis_pool)
         
         self.system_monitor = SystemMonitor()
         self.redis_monitor = RedisMonitor(self.redis_client)
@@ -198,15 +449,29 @@ class MonitoringService:
         self.cpu_threshold = float(os.getenv('CPU_ALERT_THRESHOLD', '90'))
         self.memory_threshold = float(os.getenv('MEMORY_ALERT_THRESHOLD', '90'))
         self.disk_threshold = float(os.getenv('DISK_ALERT_THRESHOLD', '90'))
+        self.alert_cooldown = int(os.getenv('ALERT_COOLDOWN', '300'))
+        # Contrôles de seuil : (section des métriques système, libellé, seuil)
+        self.system_checks = (
+            ("cpu", "CPU", self.cpu_threshold),
+            ("memory", "Memory", self.memory_threshold),
+            ("disk", "Disk", self.disk_threshold),
+        )
         
         # Configuration monitoring via variables d'environnement
         self.monitoring_interval = int(os.getenv('MONITORING_INTERVAL', '30'))
         self.history_limit = int(os.getenv('HISTORY_LIMIT', '1000'))
         self.dashboard_refresh = int(os.getenv('DASHBOARD_REFRESH', '30'))
+        self._dashboard_tail = DASHBOARD_TAIL_TEMPLATE.render(dashboard_refresh=self.dashboard_refresh).encode()
         
         # Services à monitorer via variables d'environnement
         self.service_monitors = self._setup_service_monitors()
         
+        # Boucle asyncio dédiée aux health checks, avec une session HTTP partagée (keep-alive)
+        self._aio_loop = asyncio.new_event_loop()
+        self._aio_thread = threading.Thread(target=self._aio_loop.run_forever, name='health-check-loop', daemon=True)
+        self._aio_thread.start()
+        self.http_session = self._run_async(self._create_http_session())
+        
         # Métriques globales
         self.global_metrics = {
             "packets_captured": 0,
@@ -216,12 +481,20 @@ class MonitoringService:
             "processing_rate": 0
         }
         
+        # Dernier snapshot de métriques, servi par les routes HTTP
+        self._latest_snapshot = None
+        self._metrics_lock = threading.Lock()
+        
         # Flask app pour l'interface web
         self.app = Flask(__name__)
+        # Registre Prometheus dédié (sans les collecteurs process/plateforme par défaut)
+        self.prometheus_registry = CollectorRegistry(auto_describe=False)
+        self.prometheus_registry.register(SnapshotCollector(self))
         self.setup_routes()
           # Thread de monitoring
         self.monitoring_thread = threading.Thread(target=self.monitoring_loop, daemon=True)
-        self.running = False
+        # Événement d'arrêt : interrompt immédiatement l'attente entre deux ticks
+        self._stop = threading.Event()
     
     def _setup_service_monitors(self) -> Dict:
         """Configure les moniteurs de services via variables d'environnement"""
@@ -237,217 +510,168 @@ class MonitoringService:
         
         return services
         
+    def _run_async(self, coroutine):
+        """Exécute une coroutine sur la boucle des health checks et attend son résultat"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._aio_loop).result()
+    
+    async def _create_http_session(self) -> aiohttp.ClientSession:
+        """Crée la session HTTP partagée (doit s'exécuter dans la boucle asyncio)"""
+        return aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=32, ttl_dns_cache=300))
+    
+    async def _check_all_services(self, now_iso: str) -> Dict:
+        """Vérifie tous les services en parallèle (durée = service le plus lent)"""
+        monitors = self.service_monitors
+        results = await asyncio.gather(*(monitor.check_health(self.http_session, now_iso) for monitor in monitors.values()))
+        return dict(zip(monitors, results))
+    
     def setup_routes(self):
         """Configuration des routes Flask"""
         
         @self.app.route('/health')
         def health():
-            return jsonify({"status": "healthy", "service": "monitoring"})
+            return Response(HEALTH_RESPONSE, mimetype='application/json')
             
         @self.app.route('/metrics')
         def metrics():
             """API des métriques au format JSON"""
-            return jsonify(self.get_all_metrics())
+            encoded = self.get_metrics_json()
+            if encoded is None:
+                return self._collecting_response()
+            return Response(encoded, mimetype='application/json')
+
+        @self.app.route('/metrics/prometheus')
+        def prometheus_metrics():
+            """Métriques au format texte Prometheus"""
+            return Response(generate_latest(self.prometheus_registry), content_type=CONTENT_TYPE_LATEST)
 
         @self.app.route('/')
         def dashboard():
             """Dashboard web de monitoring"""
-            html_template = '''
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <title>IDS Monitoring Dashboard</title>
-                <meta http-equiv="refresh" content="{dashboard_refresh}">
-                <style>
-                    body { font-family: Arial, sans-serif; margin: 20px; }
-                    .metric-card { 
-                        border: 1px solid #ddd; 
-                        padding: 15px; 
-                        margin: 10px; 
-                        border-radius: 5px;
-                        display: inline-block;
-                        min-width: 200px;
-                    }
-                    .healthy { background-color: #d4edda; }
-                    .unhealthy { background-color: #f8d7da; }
-                    .unreachable { background-color: #fff3cd; }
-                    .metric-value { font-size: 1.5em; font-weight: bold; }
-                    h1, h2 { color: #333; }
-                </style>
-            </head>
-            <body>
-                <h1>🛡️ IDS Distributed Monitoring Dashboard</h1>
-                
-                <h2>Services Status</h2>
-                <div id="services">
-                    {% for service, status in services.items() %}
-                    <div class="metric-card {{ status.status }}">
-                        <h3>{{ service }}</h3>
-                        <div class="metric-value">{{ status.status|upper }}</div>
-                        <p>Response Time: {{ status.response_time_ms or 'N/A' }}ms</p>
-                        <p>Uptime: {{ "%.1f"|format(status.uptime_percentage) }}%</p>
-                    </div>
-                    {% endfor %}
-                </div>
-                
-                <h2>System Metrics</h2>
-                <div class="metric-card">
-                    <h3>CPU Usage</h3>
-                    <div class="metric-value">{{ "%.1f"|format(system.cpu.usage_percent) }}%</div>
-                </div>
-                <div class="metric-card">
-                    <h3>Memory Usage</h3>
-                    <div class="metric-value">{{ "%.1f"|format(system.memory.usage_percent) }}%</div>
-                    <p>{{ system.memory.used_gb }}GB / {{ system.memory.total_gb }}GB</p>
-                </div>
-                <div class="metric-card">
-                    <h3>Disk Usage</h3>
-                    <div class="metric-value">{{ "%.1f"|format(system.disk.usage_percent) }}%</div>
-                    <p>{{ system.disk.used_gb }}GB / {{ system.disk.total_gb }}GB</p>
-                </div>
-
-                <h2>Redis Metrics</h2>
-                <div class="metric-card">
-                    <h3>Connected Clients</h3>
-                    <div class="metric-value">{{ global_metrics.redis_metrics.connected_clients }}</div>
-                </div>
-                <div class="metric-card">
-                    <h3>Memory Usage</h3>
-                    <div class="metric-value">{{ global_metrics.redis_metrics.used_memory_human }}</div>
-                    <p>Peak: {{ global_metrics.redis_metrics.used_memory_peak_human }}</p>
-                </div>
-                <div class="metric-card">
-                    <h3>Operations</h3>
-                    <div class="metric-value">{{ global_metrics.redis_metrics.instantaneous_ops_per_sec }}/s</div>
-                    <p>Total: {{ global_metrics.redis_metrics.total_commands_processed }}</p>
-                </div>
-                <div class="metric-card">
-                    <h3>Cache Hits/Misses</h3>
-                    <div class="metric-value">{{ global_metrics.redis_metrics.keyspace_hits }}/{{ global_metrics.redis_metrics.keyspace_misses }}</div>
-                </div>
-                
-                <h2>IDS Metrics</h2>
-                <div class="metric-card">
-                    <h3>Packets Captured</h3>
-                    <div class="metric-value">{{ global_metrics.packets_captured }}</div>
-                </div>
-                <div class="metric-card">
-                    <h3>Features Extracted</h3>
-                    <div class="metric-value">{{ global_metrics.features_extracted }}</div>
-                </div>
-                <div class="metric-card">
-                    <h3>Threats Detected</h3>
-                    <div class="metric-value">{{ global_metrics.threats_detected }}</div>
-                </div>
-                <div class="metric-card">
-                    <h3>Alerts Generated</h3>
-                    <div class="metric-value">{{ global_metrics.alerts_generated }}</div>
-                </div>
-                <p><em>Page refreshed automatically every {dashboard_refresh} seconds</em></p>
-            </body>
-            </html>
-            '''
-            
             metrics = self.get_all_metrics()
-            return render_template_string(
-                html_template,
+            if metrics is None:
+                return self._collecting_response()
+            body = DASHBOARD_BODY_TEMPLATE.render(
                 services=metrics['services'],
                 system=metrics['system'],
                 global_metrics=metrics['global_metrics']
             )
+            return Response(DASHBOARD_HEAD + body.encode() + self._dashboard_tail, mimetype='text/html')
+    
+    def get_all_metrics(self) -> Optional[Dict]:
+        """Retourne le dernier snapshot de métriques collecté par la boucle de monitoring (None avant le premier)"""
+        snapshot = self._get_snapshot()
+        return snapshot[0] if snapshot else None
     
-    def get_all_metrics(self) -> Dict:
-        """Collecte toutes les métriques"""
-        # Vérification des services
-        service_status = {}
-        for name, monitor in self.service_monitors.items():
-            service_status[name] = monitor.check_health()
+    def get_metrics_json(self) -> Optional[bytes]:
+        """Retourne le dernier snapshot déjà encodé en JSON (aucune sérialisation par requête)"""
+        snapshot = self._get_snapshot()
+        return snapshot[1] if snapshot else None
+    
+    def _get_snapshot(self) -> Optional[Tuple[Dict, bytes]]:
+        """Retourne le couple (métriques, JSON encodé) publié par la boucle de monitoring
         
-        # Métriques système
-        system_metrics = self.system_monitor.get_system_metrics()
+        Aucune collecte n'est faite ici : les moniteurs (compteurs d'erreurs, deltas
+        réseau, échantillonnage disque) ne sont mis à jour que par le thread de la boucle.
+        """
+        with self._metrics_lock:
+            return self._latest_snapshot
+    
+    @staticmethod
+    def _collecting_response() -> Response:
+        """Réponse 503 servie avant le premier snapshot de la boucle"""
+        response = Response(COLLECTING_RESPONSE, status=503, mimetype='application/json')
+        response.headers['Retry-After'] = '1'
+        return response
+    
+    def _collect_all_metrics(self, now: datetime) -> Dict:
+        """Collecte toutes les métriques avec un timestamp unique pour tout le snapshot"""
+        now_iso = now.isoformat()
         
-        # Métriques Redis
-        redis_metrics = self.redis_monitor.get_redis_metrics()
+        # Vérification des services en parallèle (durée = service le plus lent)
+        service_status = self._run_async(self._check_all_services(now_iso))
         
-        # Métriques globales depuis Redis
+        # Métriques système
+        system_metrics = self.system_monitor.get_system_metrics(now, now_iso)
+        
+        # Métriques Redis et compteurs globaux : INFO + MGET en un seul aller-retour
         try:
-            self.global_metrics["redis_metrics"] = redis_metrics
-            self.global_metrics["packets_captured"] = int(self.redis_client.get("metrics:packets_captured") or 0)
-            self.global_metrics["alerts_generated"] = int(self.redis_client.get("metrics:alerts_generated") or 0)
-            self.global_metrics["threats_detected"] = int(self.redis_client.get("metrics:threats_detected") or 0)
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.info()
+            pipe.mget(GLOBAL_COUNTER_KEYS)
+            info, values = pipe.execute()
+            redis_metrics = self.redis_monitor.get_redis_metrics(info)
+            for name, value in zip(GLOBAL_COUNTERS, values):
+                self.global_metrics[name] = int(value or 0)
         except Exception as e:
-            logger.error(f"Erreur lors de la récupération des métriques globales: {e}")
+            logger.error(f"Erreur lors de la récupération des métriques Redis: {e}")
+            redis_metrics = {"error": str(e)}
+        self.global_metrics["redis_metrics"] = redis_metrics
         
         return {
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": now_iso,
             "services": service_status,
             "system": system_metrics,
             "redis": redis_metrics,
-            "global_metrics": self.global_metrics
+            # Copie : le snapshot publié ne doit pas changer avec les ticks suivants
+            "global_metrics": dict(self.global_metrics)
         }
     
     def monitoring_loop(self):
         """Boucle principale de monitoring"""
         logger.info("Démarrage de la boucle de monitoring")
+        self._prepare_history_stream()
         
-        while self.running:
+        # Échéances fixes sur l'horloge monotone : la durée d'un tick ne décale pas la cadence
+        next_deadline = time.monotonic()
+        while not self._stop.is_set():
             try:
-                # Collecte des métriques
-                metrics = self.get_all_metrics()
-                  # Sauvegarde dans Redis pour historique
-                self.redis_client.lpush("monitoring:history", json.dumps(metrics))
-                self.redis_client.ltrim("monitoring:history", 0, self.history_limit)  # Garde les entrées configurables
-                
-                # Publication pour d'autres services
-                self.redis_client.publish("monitoring:metrics", json.dumps(metrics))
+                # Collecte des métriques (seul endroit où les services sont sondés)
+                metrics = self._collect_all_metrics(datetime.now())
+                encoded = orjson.dumps(metrics)
+                with self._metrics_lock:
+                    self._latest_snapshot = (metrics, encoded)
+                # Sauvegarde dans Redis pour historique et publication, en un aller-retour
+                pipe = self.redis_client.pipeline(transaction=False)
+                # Stream plafonné (trim approximatif en O(1)) aux entrées configurables
+                pipe.xadd(HISTORY_STREAM, {"json": encoded}, maxlen=self.history_limit, approximate=True)
+                pipe.publish("monitoring:metrics", encoded)  # Pour d'autres services
+                pipe.execute()
                 
                 # Détection d'anomalies
-                self.detect_anomalies(metrics)
+                self.detect_anomalies(metrics, metrics["timestamp"])
                 
-                time.sleep(self.monitoring_interval)  # Vérification selon l'intervalle configuré
+                # Vérification selon l'intervalle configuré (ticks manqués sautés si la collecte déborde)
+                next_deadline = max(next_deadline + self.monitoring_interval, time.monotonic())
+                self._stop.wait(next_deadline - time.monotonic())
                 
             except Exception as e:
                 logger.error(f"Erreur dans la boucle de monitoring: {e}")
-                time.sleep(10)
+                self._stop.wait(10)
+                next_deadline = time.monotonic()
     
-    def detect_anomalies(self, metrics: Dict):
+    def _prepare_history_stream(self):
+        """Supprime un ancien historique stocké en liste, remplacé par un stream"""
+        try:
+            if self.redis_client.type(HISTORY_STREAM) == 'list':
+                self.redis_client.delete(HISTORY_STREAM)
+                logger.info(f"Ancien historique (liste) {HISTORY_STREAM} remplacé par un stream")
+        except Exception as e:
+            logger.error(f"Erreur lors de la préparation du stream d'historique: {e}")
+    
+    def detect_anomalies(self, metrics: Dict, now_iso: str):
         """Détecte les anomalies dans les métriques"""
         alerts = []
         
-        # Vérification CPU
-        cpu_usage = metrics["system"].get("cpu", {}).get("usage_percent", 0)
-        if cpu_usage > self.cpu_threshold:
-            alerts.append({
-                "type": "system",
-                "severity": "critical",
-                "message": f"CPU usage critical: {cpu_usage}%"
-            })
-        
-        # Vérification mémoire
-        memory_usage = metrics["system"].get("memory", {}).get("usage_percent", 0)
-        if memory_usage > self.memory_threshold:
-            alerts.append({
-                "type": "system",
-                "severity": "critical",
-                "message": f"Memory usage critical: {memory_usage}%"
-            })
-        
-        # Vérification disque
-        disk_usage = metrics["system"].get("disk", {}).get("usage_percent", 0)
-        if disk_usage > self.disk_threshold:
-            alerts.append({
-                "type": "system",
-                "severity": "critical",
-                "message": f"Disk usage critical: {disk_usage}%"
-            })
-        # Vérification mémoire
-        memory_usage = metrics["system"].get("memory", {}).get("usage_percent", 0)
-        if memory_usage > self.memory_threshold:
-            alerts.append({
-                "type": "system",
-                "severity": "critical",
-                "message": f"Memory usage critical: {memory_usage}%"
-            })
+        # Vérification des seuils système en une seule passe (cpu, mémoire, disque)
+        system = metrics["system"]
+        for section, label, threshold in self.system_checks:
+            usage = system.get(section, {}).get("usage_percent", 0)
+            if usage > threshold:
+                alerts.append({
+                    "type": "system",
+                    "severity": "critical",
+                    "message": f"{label} usage critical: {usage}%"
+                })
 
         # Vérification services
         for service, status in metrics["services"].items():
@@ -458,27 +682,60 @@ class MonitoringService:
                     "message": f"Service {service} is {status['status']}"
                 })
         
-        # Publication des alertes
+        if not alerts:
+            return
+        
+        # Cooldown : un SET NX EX par alerte, envoyés en un seul aller-retour
+        pipe = self.redis_client.pipeline(transaction=False)
         for alert in alerts:
-            alert["timestamp"] = datetime.now().isoformat()
-            self.redis_client.lpush("alerts:monitoring", json.dumps(alert))
-            self.redis_client.publish("alerts:new", json.dumps(alert))
+            # Identité de l'alerte sans la valeur mesurée ("CPU usage critical: 93.1%" -> "CPU usage critical")
+            identity = alert["type"] + alert["message"].split(":", 1)[0]
+            pipe.set(f"alert:seen:{hashlib.md5(identity.encode()).hexdigest()}", "1", nx=True, ex=self.alert_cooldown)
+        fresh_alerts = [alert for alert, is_new in zip(alerts, pipe.execute()) if is_new]
+        if not fresh_alerts:
+            return
+        
+        # Publication des alertes (une seule fois par fenêtre de cooldown et par alerte), en un aller-retour
+        pipe = self.redis_client.pipeline(transaction=False)
+        for alert in fresh_alerts:
+            alert["timestamp"] = now_iso
+            encoded = orjson.dumps(alert)
+            pipe.lpush("alerts:monitoring", encoded)
+            pipe.publish("alerts:new", encoded)
             logger.warning(f"Alerte générée: {alert['message']}")
+        pipe.execute()
     
-    def start(self):
-        """Démarre le service de monitoring"""
-        self.running = True
+    def start_monitoring(self):
+        """Démarre la boucle de monitoring en arrière-plan"""
         self.monitoring_thread.start()
         logger.info("Service de monitoring démarré")
+    
+    def start(self):
+        """Démarre le service de monitoring avec le serveur Flask de développement"""
+        self.start_monitoring()
         
         # Démarrage du serveur Flask
         self.app.run(host=self.flask_host, port=self.flask_port, debug=self.flask_debug)
     
     def stop(self):
         """Arrête le service de monitoring"""
-        self.running = False
+        self._stop.set()
+        if self.monitoring_thread.is_alive():
+            self.monitoring_thread.join(timeout=5)
+        self._run_async(self.http_session.close())
+        self._aio_loop.call_soon_threadsafe(self._aio_loop.stop)
         logger.info("Service de monitoring arrêté")
 
+def create_app() -> Flask:
+    """Point d'entrée WSGI (gunicorn) : crée le service et lance sa boucle de monitoring
+    
+    Le snapshot des métriques vit dans le processus : le serveur doit tourner
+    avec un seul worker (concurrence assurée par les threads du worker).
+    """
+    service = MonitoringService()
+    service.start_monitoring()
+    return service.app
+
 if __name__ == "__main__":
     service = MonitoringService()
     